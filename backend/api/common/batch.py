@@ -0,0 +1,33 @@
+from django.contrib.auth import get_user_model
+
+from api.common.serializers import IdsSerializer
+
+User = get_user_model()
+
+# statuses of ids in batch responses
+ADDED = 'added'
+EXISTS = 'exists'
+REMOVED = 'removed'
+ABSENT = 'absent'
+NOT_FOUND = 'not_found'
+
+
+def get_batch_ids(request):
+    data = request.data
+    # DELETE body could be dropped by clients, so ids=1,2 is accepted
+    if not data and 'ids' in request.query_params:
+        data = {'ids': request.query_params['ids'].split(',')}
+    serializer = IdsSerializer(data=data)
+    serializer.is_valid(raise_exception=True)
+    return serializer.validated_data['ids']
+
+
+def lock_user(user):
+    # NOTE: rows of one user are changed by one request at a time (until
+    # commit), so rows selected after the lock are the rows which will be
+    # changed: ignore_conflicts does not tell which rows were skipped
+    User.objects.select_for_update().get(id=user.id)
+
+
+def get_statuses(ids, outcomes):
+    return [{'id': pk, 'status': outcomes[pk]} for pk in ids]
@@ -0,0 +1,80 @@
+from django.http import HttpResponse
+from rest_framework import status
+from rest_framework.renderers import JSONRenderer
+from rest_framework.response import Response
+
+from foodgram.cache_versions import get_catalog_version
+
+# max number of different urls cached per catalog
+CATALOG_MAX_BLOBS = 256
+
+
+class CatalogBlobs:
+    # Serialized responses of current catalog version kept in process memory.
+    def __init__(self):
+        self._blobs = {}  # label: (version, {url: blob})
+
+    def get(self, label, version, url):
+        stored_version, blobs = self._blobs.get(label, (None, {}))
+        if stored_version != version:
+            return None
+        return blobs.get(url)
+
+    def set(self, label, version, url, blob):
+        stored_version, blobs = self._blobs.get(label, (None, {}))
+        if stored_version != version or len(blobs) >= CATALOG_MAX_BLOBS:
+            blobs = {}
+        blobs[url] = blob
+        self._blobs[label] = (version, blobs)
+
+
+catalog_blobs = CatalogBlobs()
+
+
+class CatalogCacheMixin:
+    # Tags and ingredients are changed rarely, so list/retrieve answers are
+    # served from memory by catalog version and are marked with ETag.
+    # Clients with actual ETag in If-None-Match get 304 without body.
+
+    def _catalog_response(self, request, build_response):
+        model = self.get_queryset().model
+        label = model._meta.label_lower
+        version = get_catalog_version(model)
+        etag = f'"{label}-{version}"'
+        headers = {'ETag': etag, 'Cache-Control': 'no-cache'}
+        if_none_match = request.META.get('HTTP_IF_NONE_MATCH', '')
+        if etag in [tag.strip() for tag in if_none_match.split(',')]:
+            return Response(
+                status=status.HTTP_304_NOT_MODIFIED, headers=headers
+            )
+        if request.accepted_renderer.format != 'json':
+            return build_response()
+
+        url = request.get_full_path()
+        blob = catalog_blobs.get(label, version, url)
+        if blob is None:
+            response = build_response()
+            if response.status_code != status.HTTP_200_OK:
+                return response
+            blob = JSONRenderer().render(response.data)
+            catalog_blobs.set(label, version, url, blob)
+        response = HttpResponse(blob, content_type='application/json')
+        for header, value in headers.items():
+            response[header] = value
+        return response
+
+    def list(self, request, *args, **kwargs):
+        return self._catalog_response(
+            request,
+            lambda: super(CatalogCacheMixin, self).list(
+                request, *args, **kwargs
+            ),
+        )
+
+    def retrieve(self, request, *args, **kwargs):
+        return self._catalog_response(
+            request,
+            lambda: super(CatalogCacheMixin, self).retrieve(
+                request, *args, **kwargs
+            ),
+        )
@@ -1,47 +1,98 @@
+from django.conf import settings
+from django.db.models import Case, Exists, OuterRef, When
 from django_filters.rest_framework import BooleanFilter, CharFilter, FilterSet
 
-from recipes.models import Ingredient, Recipe
+from api.ingredients.search import ingredient_index
+from foodgram.cache_versions import get_catalog_version
+from recipes.models import Favorite, Ingredient, Recipe, ShoppingCart
+from recipes.search import search_recipes
+from tags.models import Tag
 
 
 class IngredientFilter(FilterSet):
-    name = CharFilter(field_name='name', lookup_expr='startswith')
+    name = CharFilter(method='filter_name')
 
     class Meta:
         model = Ingredient
         fields = ['name']
 
+    def filter_name(self, queryset, name, value):
+        ids = ingredient_index.search(value, settings.INGREDIENT_SEARCH_LIMIT)
+        if not ids:
+            return queryset.none()
+        # keep ranking of the index: prefix hits go first
+        return queryset.filter(id__in=ids).order_by(
+            Case(*(When(id=pk, then=rank) for rank, pk in enumerate(ids)))
+        )
+
+
+class TagIds:
+    # slug: id map of tags, refreshed when tags catalog version is changed
+    def __init__(self):
+        self._ids = None
+        self._version = None
+
+    def get(self, slugs):
+        version = get_catalog_version(Tag)
+        ids = self._ids
+        if ids is None or self._version != version:
+            ids = dict(Tag.objects.values_list('slug', 'id'))
+            self._ids, self._version = ids, version
+        return [ids[slug] for slug in slugs if slug in ids]
+
+
+tag_ids = TagIds()
+
 
 class RecipeFilter(FilterSet):
-    is_favorited = BooleanFilter()
-    is_in_shopping_cart = BooleanFilter()
-    tags = CharFilter(field_name='tags__slug')
+    is_favorited = BooleanFilter(method='filter_is_favorited')
+    is_in_shopping_cart = BooleanFilter(method='filter_is_in_shopping_cart')
+    tags = CharFilter(method='filter_tags')
+    search = CharFilter(method='filter_search')
 
     class Meta:
         model = Recipe
-        fields = ['is_favorited', 'is_in_shopping_cart', 'author', 'tags']
-
-    def filter_queryset(self, queryset):
-        # NOTE: behaviour with using is_in_shopping_cart and is_favorited
-        # will return empty result (in case if recipe are not favorited and
-        # is in shopping_cart). I think, that it's expected.
-        # F.e. we could add page with only favorited recipes in shopping_cart.
-        author = self.data.get('author')
-        if author is not None:
-            queryset = queryset.filter(author=author)
-
-        is_favorited = self.data.get('is_favorited')
-        if is_favorited is not None:
-            queryset = queryset.filter(favorite_recipe__user=self.request.user)
-
-        is_in_shopping_cart = self.data.get('is_in_shopping_cart')
-        if is_in_shopping_cart is not None:
-            queryset = queryset.filter(shopping_recipe__user=self.request.user)
-
-        tags = self.data.get('tags')
-        if tags is not None:
-            # if tags are presented we have to get list if them instead of
-            # the last one
-            tags = self.data.getlist('tags')
-            queryset = queryset.filter(tags__slug__in=tags).distinct()
-
-        return queryset
+        fields = [
+            'is_favorited',
+            'is_in_shopping_cart',
+            'author',
+            'tags',
+            'search',
+        ]
+
+    # NOTE: all filters are EXISTS subqueries instead of joins, so recipes
+    # are not duplicated and DISTINCT over recipe rows is not required.
+    # Using is_in_shopping_cart and is_favorited together returns only
+    # favorited recipes in shopping cart. It's expected.
+
+    def _filter_by_user(self, queryset, model, value):
+        user = self.request.user
+        if user.is_anonymous:
+            # anonymous user has nothing in favorites or shopping cart
+            return queryset.none() if value else queryset
+        exists = Exists(model.objects.filter(recipe=OuterRef('pk'), user=user))
+        return queryset.filter(exists if value else ~exists)
+
+    def filter_is_favorited(self, queryset, name, value):
+        return self._filter_by_user(queryset, Favorite, value)
+
+    def filter_is_in_shopping_cart(self, queryset, name, value):
+        return self._filter_by_user(queryset, ShoppingCart, value)
+
+    def filter_tags(self, queryset, name, value):
+        # if tags are presented we have to get list if them instead of
+        # the last one
+        ids = tag_ids.get(self.data.getlist('tags'))
+        if not ids:
+            return queryset.none()
+        return queryset.filter(
+            Exists(
+                Recipe.tags.through.objects.filter(
+                    recipe=OuterRef('pk'), tag_id__in=ids
+                )
+            )
+        )
+
+    def filter_search(self, queryset, name, value):
+        # recipes are ordered by relevance, unless ordering is passed
+        return search_recipes(queryset, value)
@@ -0,0 +1,194 @@
+import logging
+import re
+import threading
+import time
+from collections import Counter, deque
+
+from django.conf import settings
+from django.core.exceptions import MiddlewareNotUsed
+from django.db import connection
+
+logger = logging.getLogger(__name__)
+
+METRICS = ('total_ms', 'sql_ms', 'queries', 'view_ms', 'render_ms', 'size')
+PERCENTILES = (50, 95, 99)
+IN_LIST = re.compile(r'IN \((?:%s, )*%s\)')
+NUMBER = re.compile(r'\b\d+\b')
+
+
+def normalize_sql(sql):
+    # queries which differ only by ids or by length of IN list are the same
+    return NUMBER.sub('?', IN_LIST.sub('IN (...)', sql))
+
+
+def percentile(values, percent):
+    # nearest-rank percentile of sorted values
+    index = max(0, -(-len(values) * percent // 100) - 1)
+    return values[index]
+
+
+class QueryRecorder:
+    # execute wrapper of connection, see
+    # https://docs.djangoproject.com/en/3.2/topics/db/instrumentation/
+    def __init__(self):
+        self.count = 0
+        self.duration = 0.0
+        self.statements = Counter()
+
+    def __call__(self, execute, sql, params, many, context):
+        start = time.perf_counter()
+        try:
+            return execute(sql, params, many, context)
+        finally:
+            self.duration += time.perf_counter() - start
+            self.count += 1
+            self.statements[normalize_sql(sql)] += 1
+
+
+class EndpointStats:
+    # last samples of every endpoint in current process
+    def __init__(self):
+        self._samples = {}
+        self._duplicates = {}
+        self._lock = threading.Lock()
+
+    def record(self, endpoint, sample, duplicates):
+        with self._lock:
+            samples = self._samples.get(endpoint)
+            if samples is None:
+                samples = deque(maxlen=settings.INSTRUMENTATION_SAMPLES)
+                self._samples[endpoint] = samples
+            samples.append(sample)
+            stored = self._duplicates.setdefault(endpoint, {})
+            for sql, count in duplicates.items():
+                stored[sql] = max(stored.get(sql, 0), count)
+
+    def report(self):
+        with self._lock:
+            samples = {
+                endpoint: list(values)
+                for endpoint, values in self._samples.items()
+            }
+            duplicates = {
+                endpoint: dict(values)
+                for endpoint, values in self._duplicates.items()
+            }
+        report = {}
+        for endpoint, values in sorted(samples.items()):
+            metrics = {}
+            for position, metric in enumerate(METRICS):
+                column = sorted(sample[position] for sample in values)
+                metrics[metric] = {
+                    f'p{percent}': round(percentile(column, percent), 2)
+                    for percent in PERCENTILES
+                }
+            report[endpoint] = {
+                'requests': len(values),
+                'metrics': metrics,
+                'duplicate_queries': duplicates.get(endpoint, {}),
+            }
+        return report
+
+
+endpoint_stats = EndpointStats()
+
+
+def get_endpoint_name(view_func, method):
+    cls = getattr(view_func, 'cls', None)
+    if cls is None:
+        return f'{view_func.__module__}.{view_func.__name__}'
+    actions = getattr(view_func, 'actions', None)
+    if actions:
+        # viewsets: RecipeViewSet.list
+        return f'{cls.__name__}.{actions.get(method.lower(), method)}'
+    # NOTE: for function views api_view names class as the function
+    return cls.__name__
+
+
+def count_size(content, record):
+    # streaming content is sent after middleware, so its size is recorded
+    # when the last chunk is sent (or the client has gone away)
+    size = 0
+    try:
+        for chunk in content:
+            size += len(chunk)
+            yield chunk
+    finally:
+        record(size)
+
+
+class InstrumentationMiddleware:
+    # Collects query count, SQL time, view and render time and response
+    # size per endpoint. Enabled by INSTRUMENTATION setting, report is
+    # available for admins on /api/metrics/.
+
+    def __init__(self, get_response):
+        if not settings.INSTRUMENTATION:
+            raise MiddlewareNotUsed
+        self.get_response = get_response
+
+    def __call__(self, request):
+        request.instrumentation = {'endpoint': 'unresolved', 'render': 0.0}
+        recorder = QueryRecorder()
+        start = time.perf_counter()
+        with connection.execute_wrapper(recorder):
+            response = self.get_response(request)
+        total = time.perf_counter() - start
+
+        render = request.instrumentation['render']
+        view = max(total - recorder.duration - render, 0.0)
+        duplicates = {
+            sql: count
+            for sql, count in recorder.statements.items()
+            if count >= settings.INSTRUMENTATION_DUPLICATE_QUERIES
+        }
+        endpoint = request.instrumentation['endpoint']
+        for sql, count in duplicates.items():
+            logger.warning('%s: %s queries like %s', endpoint, count, sql)
+
+        def record(size):
+            endpoint_stats.record(
+                endpoint,
+                (
+                    total * 1000,
+                    recorder.duration * 1000,
+                    recorder.count,
+                    view * 1000,
+                    render * 1000,
+                    size,
+                ),
+                duplicates,
+            )
+
+        if response.streaming:
+            response.streaming_content = count_size(
+                response.streaming_content, record
+            )
+        else:
+            record(len(response.content))
+        response['Server-Timing'] = ', '.join(
+            (
+                f'db;dur={recorder.duration * 1000:.1f};'
+                f'desc="{recorder.count} queries"',
+                f'view;dur={view * 1000:.1f}',
+                f'render;dur={render * 1000:.1f}',
+                f'total;dur={total * 1000:.1f}',
+            )
+        )
+        return response
+
+    def process_view(self, request, view_func, view_args, view_kwargs):
+        request.instrumentation['endpoint'] = get_endpoint_name(
+            view_func, request.method
+        )
+
+    def process_template_response(self, request, response):
+        # DRF responses are rendered after view, render time is measured
+        # from here till post render callback
+        start = time.perf_counter()
+
+        def finish_render(response):
+            request.instrumentation['render'] += time.perf_counter() - start
+
+        response.add_post_render_callback(finish_render)
+        return response
@@ -1,5 +1,166 @@
+import base64
+import binascii
+import hashlib
+import json
+from collections import OrderedDict
+
+from django.conf import settings
+from django.core.cache import cache
+from django.core.exceptions import ValidationError as DjangoValidationError
+from django.db import connections
+from django.db.models import Q
+from rest_framework.exceptions import NotFound, ValidationError
 from rest_framework.pagination import PageNumberPagination
+from rest_framework.response import Response
+from rest_framework.utils.urls import replace_query_param
+
+COUNT_CACHE_KEY = 'pagination-count:{digest}'
+
+
+def estimate_count(queryset):
+    # NOTE: exact COUNT(*) is slow on big tables, so for unfiltered queryset
+    # planner statistics are used on PostgreSQL, otherwise count is cached.
+    # queryset.none() (unknown tag, anonymous is_favorited) has no SQL
+    if queryset.query.is_empty():
+        return 0
+    connection = connections[queryset.db]
+    if connection.vendor == 'postgresql' and not queryset.query.where:
+        with connection.cursor() as cursor:
+            cursor.execute(
+                'SELECT reltuples FROM pg_class WHERE relname = %s',
+                [queryset.model._meta.db_table],
+            )
+            row = cursor.fetchone()
+        # reltuples is -1 for tables which were never analyzed
+        if row is not None and row[0] >= 0:
+            return int(row[0])
+
+    digest = hashlib.sha1(str(queryset.query).encode('utf-8')).hexdigest()
+    key = COUNT_CACHE_KEY.format(digest=digest)
+    count = cache.get(key)
+    if count is None:
+        count = queryset.count()
+        cache.set(key, count, settings.PAGINATION_COUNT_CACHE_TIMEOUT)
+    return count
+
+
+def keyset_filter(ordering, values):
+    # rows after (v1, v2, ...) for ordering (f1, f2, ...):
+    # f1 > v1 OR (f1 = v1 AND f2 > v2) OR ...
+    condition = Q()
+    equal = {}
+    for field, value in zip(ordering, values):
+        name = field.lstrip('-')
+        lookup = 'lt' if field.startswith('-') else 'gt'
+        condition |= Q(**equal, **{f'{name}__{lookup}': value})
+        equal[name] = value
+    return condition
 
 
 class CustomPagination(PageNumberPagination):
     page_size_query_param = 'limit'
+    # NOTE: keyset pagination is used when cursor parameter is passed
+    # (empty for the first page) and view defines keyset_ordering.
+    # Response has the same fields, previous is always null and count
+    # is estimated.
+    cursor_query_param = 'cursor'
+    invalid_cursor_message = 'Неверный курсор'
+    # keyset order replaces any other order of rows, so such parameters
+    # could not be combined with cursor
+    cursor_conflicting_params = ('ordering', 'search')
+
+    def paginate_queryset(self, queryset, request, view=None):
+        self.keyset_ordering = getattr(view, 'keyset_ordering', None)
+        if (
+            self.keyset_ordering is None
+            or self.cursor_query_param not in request.query_params
+        ):
+            self.keyset_ordering = None
+            return super().paginate_queryset(queryset, request, view)
+
+        conflicting = [
+            param
+            for param in self.cursor_conflicting_params
+            if param in request.query_params
+        ]
+        if conflicting:
+            raise ValidationError(
+                {
+                    self.cursor_query_param: (
+                        'Нельзя использовать вместе с '
+                        f'{", ".join(conflicting)}'
+                    )
+                }
+            )
+        self.request = request
+        page_size = self.get_page_size(request)
+        queryset = queryset.order_by(*self.keyset_ordering)
+        self.count = estimate_count(queryset)
+        cursor = self.decode_cursor(request)
+        if cursor is not None:
+            try:
+                queryset = queryset.filter(
+                    keyset_filter(self.keyset_ordering, cursor)
+                )
+            except (DjangoValidationError, TypeError, ValueError):
+                raise NotFound(self.invalid_cursor_message)
+        page = list(queryset[: page_size + 1])
+        self.next_cursor = None
+        if len(page) > page_size:
+            page = page[:page_size]
+            self.next_cursor = self.encode_cursor(page[-1])
+        return page
+
+    def decode_cursor(self, request):
+        encoded = request.query_params[self.cursor_query_param]
+        if not encoded:
+            return None
+        try:
+            values = json.loads(base64.urlsafe_b64decode(encoded.encode()))
+        except (binascii.Error, UnicodeDecodeError, ValueError):
+            raise NotFound(self.invalid_cursor_message)
+        if not isinstance(values, list) or len(values) != len(
+            self.keyset_ordering
+        ):
+            raise NotFound(self.invalid_cursor_message)
+        return values
+
+    def encode_cursor(self, obj):
+        values = [
+            getattr(obj, field.lstrip('-')) for field in self.keyset_ordering
+        ]
+        # NOTE: DjangoJSONEncoder cuts microseconds of datetime, but exact
+        # values are required to compare with the last row
+        data = json.dumps(values, default=lambda value: value.isoformat())
+        data = data.encode()
+        return base64.urlsafe_b64encode(data).decode()
+
+    def get_next_link(self):
+        if self.keyset_ordering is None:
+            return super().get_next_link()
+        if self.next_cursor is None:
+            return None
+        return replace_query_param(
+            self.request.build_absolute_uri(),
+            self.cursor_query_param,
+            self.next_cursor,
+        )
+
+    def get_previous_link(self):
+        if self.keyset_ordering is None:
+            return super().get_previous_link()
+        return None
+
+    def get_paginated_response(self, data):
+        if self.keyset_ordering is None:
+            return super().get_paginated_response(data)
+        return Response(
+            OrderedDict(
+                [
+                    ('count', self.count),
+                    ('next', self.get_next_link()),
+                    ('previous', None),
+                    ('results', data),
+                ]
+            )
+        )
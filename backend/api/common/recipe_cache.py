@@ -0,0 +1,123 @@
+import hashlib
+import threading
+from collections import Counter
+
+from django.conf import settings
+from django.core.cache import cache
+from django.http import HttpResponse
+from rest_framework import status
+from rest_framework.renderers import JSONRenderer
+
+from foodgram.cache_versions import (
+    COUNTERS_GENERATION,
+    LIST_GENERATION,
+    USERS_GENERATION,
+    get_catalog_version,
+    get_generations,
+    recipe_generation,
+)
+from ingredients.models import Ingredient
+from tags.models import Tag
+
+RESPONSE_KEY = 'recipe-cache:{action}:{params}:{generations}'
+
+
+class CacheStats:
+    # hits and misses of current process by view action
+    def __init__(self):
+        self._counter = Counter()
+        self._lock = threading.Lock()
+
+    def record(self, action, result):
+        with self._lock:
+            self._counter[(action, result)] += 1
+
+    def snapshot(self):
+        with self._lock:
+            counter = self._counter.copy()
+        stats = {}
+        for (action, result), count in counter.items():
+            stats.setdefault(action, {'hit': 0, 'miss': 0})[result] = count
+        return stats
+
+
+cache_stats = CacheStats()
+
+
+def normalize_params(query_params):
+    # the same parameters in other order share cache entry
+    return '&'.join(
+        f'{name}={value}'
+        for name, values in sorted(query_params.lists())
+        for value in sorted(values)
+    )
+
+
+class AnonymousCacheMixin:
+    # Rendered list/retrieve responses for anonymous users. Entries are
+    # not deleted on changes, generations of data are part of cache key
+    # instead and they are bumped by signals (see api/signals.py).
+
+    def _generation_names(self):
+        names = [USERS_GENERATION]
+        if self.action == 'retrieve':
+            names.append(recipe_generation(self.kwargs.get('pk')))
+            return names
+        names.append(LIST_GENERATION)
+        if 'count' in self.request.query_params.get('ordering', ''):
+            names.append(COUNTERS_GENERATION)
+        return names
+
+    def _cache_key(self, request):
+        generations = get_generations(self._generation_names()) + [
+            get_catalog_version(Tag),
+            get_catalog_version(Ingredient),
+        ]
+        # host is a part of absolute image urls
+        params = normalize_params(request.query_params)
+        params = f'{request.get_host()}/{self.kwargs.get("pk")}?{params}'
+        return RESPONSE_KEY.format(
+            action=self.action,
+            params=hashlib.sha1(params.encode('utf-8')).hexdigest(),
+            generations='-'.join(map(str, generations)),
+        )
+
+    def _cached_response(self, request, build_response):
+        if (
+            not request.user.is_anonymous
+            or request.accepted_renderer.format != 'json'
+        ):
+            return build_response()
+        key = self._cache_key(request)
+        blob = cache.get(key)
+        if blob is not None:
+            cache_stats.record(self.action, 'hit')
+            response = HttpResponse(blob, content_type='application/json')
+            response['X-Cache'] = 'HIT'
+            return response
+        cache_stats.record(self.action, 'miss')
+        response = build_response()
+        if response.status_code == status.HTTP_200_OK:
+            cache.set(
+                key,
+                JSONRenderer().render(response.data),
+                settings.RECIPE_CACHE_TIMEOUT,
+            )
+        response['X-Cache'] = 'MISS'
+        return response
+
+    def list(self, request, *args, **kwargs):
+        return self._cached_response(
+            request,
+            lambda: super(AnonymousCacheMixin, self).list(
+                request, *args, **kwargs
+            ),
+        )
+
+    def retrieve(self, request, *args, **kwargs):
+        return self._cached_response(
+            request,
+            lambda: super(AnonymousCacheMixin, self).retrieve(
+                request, *args, **kwargs
+            ),
+        )
@@ -1,15 +1,52 @@
 import base64
+import binascii
 
+from django.conf import settings
 from django.core.files.base import ContentFile
 from rest_framework import serializers
 
+IMAGE_FORMATS = ('jpeg', 'jpg', 'png', 'gif', 'webp')
+
 
 class Base64ImageField(serializers.ImageField):
+    default_error_messages = {
+        'base64': 'Некорректное изображение в формате base64.',
+        'image_format': 'Формат изображения {format} не поддерживается.',
+        'image_size': 'Размер изображения превышает {max_size} байт.',
+    }
+
     def to_internal_value(self, data):
         if isinstance(data, str) and data.startswith('data:image'):
-            format_, imgstr = data.split(';base64,')
-            ext = format_.split('/')[-1]
+            try:
+                format_, imgstr = data.split(';base64,')
+            except ValueError:
+                self.fail('base64')
+            ext = format_.split('/')[-1].lower()
+            if ext not in IMAGE_FORMATS:
+                self.fail('image_format', format=ext)
+            # NOTE: size is checked before decoding, so too big images are
+            # not copied in memory once again
+            max_size = settings.RECIPE_IMAGE_MAX_SIZE
+            if len(imgstr) // 4 * 3 > max_size + 2:
+                self.fail('image_size', max_size=max_size)
+            try:
+                content = base64.b64decode(imgstr, validate=True)
+            except (binascii.Error, ValueError):
+                self.fail('base64')
+            if len(content) > max_size:
+                self.fail('image_size', max_size=max_size)
 
-            data = ContentFile(base64.b64decode(imgstr), name='temp.' + ext)
+            data = ContentFile(content, name='temp.' + ext)
 
         return super().to_internal_value(data)
+
+
+class PreviewImageField(serializers.ImageField):
+    # preview is made in background, original image is returned until it
+    # is ready
+    def __init__(self, **kwargs):
+        kwargs['read_only'] = True
+        super().__init__(**kwargs)
+
+    def get_attribute(self, instance):
+        return instance.preview or instance.image
@@ -1,15 +1,21 @@
+import csv
+import hashlib
 import io
+import json
 
-from reportlab.lib.styles import getSampleStyleSheet
+from django.conf import settings
+from django.core.cache import cache
+from reportlab.lib.styles import ParagraphStyle, getSampleStyleSheet
 from reportlab.lib.units import inch
+from reportlab.lib.utils import simpleSplit
 from reportlab.pdfbase import pdfmetrics
 from reportlab.pdfbase.ttfonts import TTFont
+from reportlab.pdfgen.canvas import Canvas
 from reportlab.platypus import Paragraph, SimpleDocTemplate, Spacer
 from reportlab.rl_config import defaultPageSize
 
 PAGE_HEIGHT = defaultPageSize[1]
 PAGE_WIDTH = defaultPageSize[0]
-styles = getSampleStyleSheet()
 
 TITLE = "Список ингредиентов для покупки"
 PAGE_INFO = "Foodgram закупочка"
@@ -17,6 +23,16 @@ PAGE_INFO = "Foodgram закупочка"
 FONT_NAME = 'FreeSans'
 pdfmetrics.registerFont(TTFont(FONT_NAME, 'FreeSans.ttf'))
 
+# NOTE: own style instead of mutation of the shared sample stylesheet on
+# every request
+STYLE = ParagraphStyle(
+    'ShoppingList', parent=getSampleStyleSheet()['Normal'], fontName=FONT_NAME
+)
+LINE_SPACE = 0.05 * inch
+
+SHOPPING_LIST_CACHE_KEY = 'shopping-list-pdf:{user_id}'
+SHOPPING_LIST_FIELDS = ('name', 'measurement_unit', 'amount')
+
 
 def first_page(canvas, doc):
     canvas.setFont(FONT_NAME, 16)
@@ -36,19 +52,110 @@ def later_pages(canvas, doc):
     canvas.restoreState()
 
 
-def generate_pdf_file(output_text_list):
-    buffer = io.BytesIO()
-
+def _build_story_pdf(buffer, output_text_list):
     doc = SimpleDocTemplate(buffer)
     story = [Spacer(1, inch)]
-    style = styles["Normal"]
-    style.fontName = FONT_NAME
     for text in output_text_list:
-        p = Paragraph(text, style)
-        story.append(p)
-        story.append(Spacer(1, 0.05 * inch))
+        story.append(Paragraph(text, STYLE))
+        story.append(Spacer(1, LINE_SPACE))
 
     doc.build(story, onFirstPage=first_page, onLaterPages=later_pages)
 
+
+def _draw_canvas_pdf(buffer, output_text_list):
+    # Fast path for long lists: lines are drawn directly, so there are no
+    # flowables kept in memory and no layout pass for the whole document.
+    canvas = Canvas(buffer, pagesize=defaultPageSize)
+    # the same frame and first spacer as in _build_story_pdf
+    bottom = inch
+    width = PAGE_WIDTH - 2 * inch
+    page = 1
+    first_page(canvas, None)
+    canvas.setFont(FONT_NAME, STYLE.fontSize)
+    y = PAGE_HEIGHT - 2 * inch - STYLE.leading
+    for text in output_text_list:
+        for line in simpleSplit(text, FONT_NAME, STYLE.fontSize, width):
+            if y < bottom:
+                canvas.showPage()
+                page += 1
+                canvas.setFont(FONT_NAME, 9)
+                canvas.drawString(
+                    inch, 0.25 * inch, "Страница %d / %s" % (page, PAGE_INFO)
+                )
+                canvas.setFont(FONT_NAME, STYLE.fontSize)
+                y = PAGE_HEIGHT - inch - STYLE.leading
+            canvas.drawString(inch, y, line)
+            y -= STYLE.leading
+        y -= LINE_SPACE
+    canvas.save()
+
+
+def generate_pdf_file(output_text_list):
+    buffer = io.BytesIO()
+    if len(output_text_list) > settings.SHOPPING_LIST_CANVAS_THRESHOLD:
+        _draw_canvas_pdf(buffer, output_text_list)
+    else:
+        _build_story_pdf(buffer, output_text_list)
+
     buffer.seek(0)
     return buffer
+
+
+def get_shopping_list_pdf(user_id, output_text_list):
+    # Fingerprint is calculated from aggregated cart content, so any change
+    # of cart or used ingredients of recipes in the cart leads to new pdf.
+    # Only the last pdf is stored per user.
+    fingerprint = hashlib.sha1(
+        '\n'.join(output_text_list).encode()
+    ).hexdigest()
+    key = SHOPPING_LIST_CACHE_KEY.format(user_id=user_id)
+    cached = cache.get(key)
+    if cached is not None and cached[0] == fingerprint:
+        return io.BytesIO(cached[1])
+
+    buffer = generate_pdf_file(output_text_list)
+    cache.set(
+        key,
+        (fingerprint, buffer.getvalue()),
+        settings.SHOPPING_LIST_CACHE_TIMEOUT,
+    )
+    return buffer
+
+
+def format_shopping_list_line(row):
+    return f'{row["name"]} ({row["measurement_unit"]}) - {row["amount"]}'
+
+
+def stream_text(rows):
+    for row in rows:
+        yield format_shopping_list_line(row) + '\n'
+
+
+class _Echo:
+    def write(self, value):
+        return value
+
+
+def stream_csv(rows):
+    writer = csv.writer(_Echo())
+    yield writer.writerow(SHOPPING_LIST_FIELDS)
+    for row in rows:
+        yield writer.writerow([row[field] for field in SHOPPING_LIST_FIELDS])
+
+
+def stream_json(rows):
+    separator = '['
+    for row in rows:
+        yield separator + json.dumps(
+            {field: row[field] for field in SHOPPING_LIST_FIELDS},
+            ensure_ascii=False,
+        )
+        separator = ','
+    yield ']' if separator == ',' else '[]'
+
+
+SHOPPING_LIST_STREAMS = {
+    'txt': stream_text,
+    'csv': stream_csv,
+    'json': stream_json,
+}
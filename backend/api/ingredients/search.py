@@ -0,0 +1,95 @@
+import threading
+from bisect import bisect_left
+from collections import defaultdict
+
+from foodgram.cache_versions import get_catalog_version
+from ingredients.models import Ingredient
+
+
+class IngredientIndex:
+    # In-process index for ingredient autocomplete. Names are stored
+    # lowercased in sorted order, so prefix search is a binary search plus
+    # a short scan. Ingredients which contain query in other place are
+    # returned after prefix hits: word beginnings first, then any substring.
+    # Substring candidates are taken from trigram postings, so the whole
+    # catalog is scanned only for queries shorter than a trigram.
+    # Index is rebuilt when ingredients catalog version is changed, unless
+    # it is not refreshed (index built from other rows, e.g. benchmark).
+
+    def __init__(self, refresh=True):
+        self.refresh = refresh
+        self._entries = None
+        self._version = None
+        self._lock = threading.Lock()
+
+    def build(self, rows):
+        entries = sorted((name.lower(), pk) for pk, name in rows)
+        keys = [key for key, _ in entries]
+        ids = [pk for _, pk in entries]
+        trigrams = defaultdict(list)
+        for position, key in enumerate(keys):
+            for trigram in {key[i : i + 3] for i in range(len(key) - 2)}:
+                trigrams[trigram].append(position)
+        # single assignment, index could be used in other threads
+        self._entries = (keys, ids, dict(trigrams))
+
+    def _ensure_built(self):
+        entries = self._entries
+        if entries is not None and not self.refresh:
+            return entries
+        version = get_catalog_version(Ingredient)
+        if entries is None or self._version != version:
+            with self._lock:
+                if self._entries is None or self._version != version:
+                    self.build(
+                        Ingredient.objects.order_by().values_list('id', 'name')
+                    )
+                    self._version = version
+                entries = self._entries
+        return entries
+
+    def search(self, query, limit):
+        query = query.strip().lower()
+        keys, ids, trigrams = self._ensure_built()
+        found = []
+        position = bisect_left(keys, query)
+        while (
+            position < len(keys)
+            and len(found) < limit
+            and keys[position].startswith(query)
+        ):
+            found.append(ids[position])
+            position += 1
+        if len(found) >= limit:
+            return found
+
+        if len(query) < 3:
+            candidates = range(len(keys))
+        else:
+            postings = sorted(
+                (
+                    trigrams.get(query[i : i + 3], ())
+                    for i in range(len(query) - 2)
+                ),
+                key=len,
+            )
+            candidates = set(postings[0]).intersection(*postings[1:])
+            candidates = sorted(candidates)
+
+        word_hits = []
+        substring_hits = []
+        word_query = ' ' + query
+        for position in candidates:
+            key = keys[position]
+            if key.startswith(query):
+                continue
+            if word_query in key:
+                word_hits.append(ids[position])
+                if len(found) + len(word_hits) >= limit:
+                    break
+            elif query in key:
+                substring_hits.append(ids[position])
+        return (found + word_hits + substring_hits)[:limit]
+
+
+ingredient_index = IngredientIndex()
@@ -1,13 +1,14 @@
 from django_filters.rest_framework import DjangoFilterBackend
 from rest_framework import permissions
 
+from api.common.catalog import CatalogCacheMixin
 from api.common.filters import IngredientFilter
 from api.common.mixins import ListRetrieveViewSet
 from ingredients.models import Ingredient
 from .serializers import IngredientSerializer
 
 
-class IngredientViewSet(ListRetrieveViewSet):
+class IngredientViewSet(CatalogCacheMixin, ListRetrieveViewSet):
     serializer_class = IngredientSerializer
     permission_classes = (permissions.AllowAny,)
     queryset = Ingredient.objects.all()
@@ -0,0 +1,658 @@
+import csv
+import json
+import os
+import platform
+import random
+import subprocess
+import sys
+import tempfile
+import threading
+import time
+from collections import Counter
+from datetime import datetime, timezone
+from urllib.error import HTTPError, URLError
+from urllib.parse import quote, urlencode
+from urllib.request import Request, urlopen
+
+from django.conf import settings
+from django.contrib.auth import get_user_model
+from django.core.cache import cache
+from django.core.management.base import BaseCommand, CommandError
+from django.db import connection
+from django.db.models import Count, Q
+from django.test import Client
+from django.test.utils import CaptureQueriesContext
+from rest_framework.authtoken.models import Token
+
+from api.common.instrumentation import percentile
+from api.common.utils import (
+    SHOPPING_LIST_STREAMS,
+    format_shopping_list_line,
+    generate_pdf_file,
+)
+from api.ingredients.search import IngredientIndex
+from api.recipes.batch import add_recipes, remove_recipes
+from ingredients.models import Ingredient
+from recipes.models import Favorite, Recipe, ShoppingCart
+from tags.models import Tag
+
+User = get_user_model()
+
+# 1x1 png for recipe creation
+IMAGE = (
+    'data:image/png;base64,iVBORw0KGgoAAAANSUhEUgAAAAEAAAABCAQAAAC1HAwCAAAAC0'
+    'lEQVR42mNkYAAAAAYAAjCB0C8AAAAASUVORK5CYII='
+)
+
+
+def measure(func, repeat):
+    timings = []
+    for _ in range(repeat):
+        start = time.perf_counter()
+        func()
+        timings.append(time.perf_counter() - start)
+    timings.sort()
+    return {
+        'min_ms': timings[0] * 1000,
+        'median_ms': timings[len(timings) // 2] * 1000,
+    }
+
+
+def bench_shopping_list_formats(options):
+    results = []
+    for size in (10, 100, 1000):
+        rows = [
+            {
+                'name': f'ингредиент {idx}',
+                'measurement_unit': random.choice(('г', 'мл', 'шт.')),
+                'amount': random.randint(1, 1000),
+            }
+            for idx in range(size)
+        ]
+        for output_format, stream in SHOPPING_LIST_STREAMS.items():
+            results.append(
+                {
+                    'name': f'{output_format}[{size}]',
+                    **measure(
+                        lambda: ''.join(stream(iter(rows))),
+                        options['repeat'],
+                    ),
+                }
+            )
+        results.append(
+            {
+                'name': f'pdf[{size}]',
+                **measure(
+                    lambda: generate_pdf_file(
+                        [format_shopping_list_line(row) for row in rows]
+                    ),
+                    options['repeat'],
+                ),
+            }
+        )
+    return results
+
+
+def bench_ingredient_autocomplete(options):
+    f_path = os.path.join(options['data_dir'], 'ingredients.csv')
+    if not os.path.exists(f_path):
+        raise CommandError(f'Файл {f_path} не найден')
+    with open(f_path, newline='', encoding='utf-8') as csvfile:
+        rows = [
+            (idx, row['name'])
+            for idx, row in enumerate(csv.DictReader(csvfile), start=1)
+        ]
+    # rows are taken from csv, not from database
+    index = IngredientIndex(refresh=False)
+    build = measure(lambda: index.build(rows), options['repeat'])
+    # every prefix of sample names imitates user typing in autocomplete
+    names = [name for _, name in random.Random(0).sample(rows, 50)]
+    keystrokes = [
+        name[:length] for name in names for length in range(1, len(name) + 1)
+    ]
+    limit = settings.INGREDIENT_SEARCH_LIMIT
+
+    def search_index():
+        for query in keystrokes:
+            index.search(query, limit)
+
+    def search_scan():
+        for query in keystrokes:
+            query = query.lower()
+            [pk for pk, name in rows if name.lower().startswith(query)]
+
+    results = [{'name': f'build[{len(rows)}]', **build}]
+    for name, func in (('index', search_index), ('scan', search_scan)):
+        timings = measure(func, options['repeat'])
+        results.append(
+            {
+                'name': f'{name} per keystroke',
+                **{
+                    key: value / len(keystrokes)
+                    for key, value in timings.items()
+                },
+            }
+        )
+    return results
+
+
+def run_manage(*args):
+    # separate process, so peak RSS is measured for this command only
+    start = time.perf_counter()
+    process = subprocess.Popen(
+        [sys.executable, 'manage.py', *args],
+        cwd=settings.BASE_DIR,
+        stdout=subprocess.DEVNULL,
+    )
+    _, exit_status, usage = os.wait4(process.pid, 0)
+    process.returncode = os.waitstatus_to_exitcode(exit_status)
+    if process.returncode:
+        raise CommandError(f'manage.py {" ".join(args)} завершилась ошибкой')
+    return time.perf_counter() - start, usage.ru_maxrss / 1024
+
+
+def generate_dataset(csv_dir, rows):
+    run_manage(
+        'generate_csv',
+        csv_dir,
+        f'--users={max(rows // 100, 10)}',
+        f'--follows={rows // 10}',
+        f'--recipes={rows // 10}',
+        f'--favorites={rows}',
+    )
+
+
+def bench_loadcsv(options):
+    # NOTE: DB is flushed before every load, so scenario is not started
+    # without explicit --allow-flush
+    if not options['allow_flush']:
+        raise CommandError(
+            'Сценарий loadcsv очищает БД, запустите его с --allow-flush'
+        )
+    results = []
+    with tempfile.TemporaryDirectory() as csv_dir:
+        generate_dataset(csv_dir, options['rows'])
+        total_rows = 0
+        for f_name in os.listdir(csv_dir):
+            with open(os.path.join(csv_dir, f_name), encoding='utf-8') as f:
+                total_rows += sum(1 for _ in f) - 1
+        paths = [('orm', ['--no-copy'])]
+        if connection.vendor == 'postgresql':
+            paths.append(('copy', []))
+        for name, args in paths:
+            run_manage('flush', '--noinput')
+            seconds, peak_rss = run_manage('loadcsv', csv_dir, *args)
+            results.append(
+                {
+                    'name': f'{name}[{total_rows} rows]',
+                    'seconds': seconds,
+                    'rows_per_sec': total_rows / seconds,
+                    'peak_rss_mb': peak_rss,
+                }
+            )
+    return results
+
+
+def get_api_user():
+    # user with the most subscriptions has the heaviest feed
+    user = (
+        User.objects.annotate(follows=Count('follower'))
+        .order_by('-follows', 'id')
+        .first()
+    )
+    if user is None or not Recipe.objects.exists():
+        raise CommandError(
+            'Нет данных для сценария api: загрузите их командой loadcsv '
+            'или запустите с --seed-rows и --allow-flush'
+        )
+    return user
+
+
+def get_api_clients():
+    user = get_api_user()
+    token, _ = Token.objects.get_or_create(user=user)
+    host = settings.ALLOWED_HOSTS[0].lstrip('.').replace('*', 'localhost')
+    anon = Client(HTTP_HOST=host)
+    auth = Client(HTTP_HOST=host, HTTP_AUTHORIZATION=f'Token {token.key}')
+    return user, anon, auth
+
+
+def measure_request(client, method, url, options, **kwargs):
+    def request():
+        if options['cold']:
+            cache.clear()
+        response = getattr(client, method)(url, **kwargs)
+        if response.status_code >= 400:
+            raise CommandError(
+                f'{method.upper()} {url}: {response.status_code}'
+            )
+        return response
+
+    with CaptureQueriesContext(connection) as context:
+        response = request()
+    # captured_queries is read from connection log, which is reset by the
+    # next request
+    queries = len(context.captured_queries)
+    if response.streaming:
+        size = len(b''.join(response.streaming_content))
+    else:
+        size = len(response.content)
+    return {
+        **measure(request, options['repeat']),
+        'queries': queries,
+        'bytes': size,
+    }
+
+
+def bench_api_reads(user, anon, auth, options):
+    recipe = Recipe.objects.order_by('-pub_date').first()
+    slugs = '&'.join(
+        f'tags={slug}'
+        for slug in Tag.objects.values_list('slug', flat=True)[:2]
+    )
+    requests = (
+        ('list anonymous', anon, '/api/recipes/?limit=6'),
+        ('list tags', anon, f'/api/recipes/?limit=6&{slugs}'),
+        ('list', auth, '/api/recipes/?limit=6'),
+        ('list cursor', auth, '/api/recipes/?limit=6&cursor='),
+        ('list favorited', auth, '/api/recipes/?limit=6&is_favorited=1'),
+        ('feed', auth, '/api/recipes/feed/?limit=6'),
+        ('retrieve anonymous', anon, f'/api/recipes/{recipe.id}/'),
+        ('retrieve', auth, f'/api/recipes/{recipe.id}/'),
+        (
+            'subscriptions',
+            auth,
+            '/api/users/subscriptions/?limit=6&recipes_limit=3',
+        ),
+    )
+    return [
+        {'name': name, **measure_request(client, 'get', url, options)}
+        for name, client, url in requests
+    ]
+
+
+def bench_api_create(user, anon, auth, options):
+    data = {
+        'ingredients': [
+            {'id': pk, 'amount': 100}
+            for pk in Ingredient.objects.values_list('id', flat=True)[:10]
+        ],
+        'tags': list(Tag.objects.values_list('id', flat=True)[:2]),
+        'image': IMAGE,
+        'name': 'Рецепт для замеров',
+        'text': 'benchmark',
+        'cooking_time': 10,
+    }
+    created = []
+
+    def create():
+        response = auth.post(
+            '/api/recipes/', data=data, content_type='application/json'
+        )
+        if response.status_code != 201:
+            raise CommandError(f'POST /api/recipes/: {response.status_code}')
+        created.append(response.json()['id'])
+
+    try:
+        return [{'name': 'create', **measure(create, options['repeat'])}]
+    finally:
+        Recipe.objects.filter(id__in=created).delete()
+
+
+def bench_api_toggles(user, anon, auth, options):
+    results = []
+    for action, model in (
+        ('favorite', Favorite),
+        ('shopping_cart', ShoppingCart),
+    ):
+        recipe = Recipe.objects.exclude(
+            id__in=model.objects.filter(user=user).values('recipe')
+        ).first()
+        url = f'/api/recipes/{recipe.id}/{action}/'
+
+        def toggle(url=url):
+            auth.post(url)
+            auth.delete(url)
+
+        results.append(
+            {'name': f'{action} toggle', **measure(toggle, options['repeat'])}
+        )
+    return results
+
+
+def bench_api_download(user, anon, auth, options):
+    # shopping list of 20 recipes, added recipes are removed after (batch
+    # actions keep shopping list and counters of recipes)
+    added = list(
+        Recipe.objects.exclude(
+            id__in=ShoppingCart.objects.filter(user=user).values('recipe')
+        ).values_list('id', flat=True)[:20]
+    )
+    add_recipes(ShoppingCart, user, added)
+    try:
+        return [
+            {
+                'name': f'download {output_format}',
+                **measure_request(
+                    auth,
+                    'get',
+                    '/api/recipes/download_shopping_cart/'
+                    f'?format={output_format}',
+                    options,
+                ),
+            }
+            for output_format in ('txt', 'pdf')
+        ]
+    finally:
+        remove_recipes(ShoppingCart, user, added)
+
+
+def bench_api_autocomplete(user, anon, auth, options):
+    names = Ingredient.objects.values_list('name', flat=True)[:5]
+    keystrokes = [
+        name[:length] for name in names for length in range(1, len(name) + 1)
+    ]
+
+    def autocomplete():
+        for query in keystrokes:
+            auth.get('/api/ingredients/', {'name': query})
+
+    timings = measure(autocomplete, options['repeat'])
+    return [
+        {
+            'name': 'autocomplete per keystroke',
+            **{key: value / len(keystrokes) for key, value in timings.items()},
+        }
+    ]
+
+
+def bench_api(options):
+    # NOTE: requests go through all middlewares and views with test client,
+    # recipes, favorites and shopping cart items are created and removed.
+    user, anon, auth = get_api_clients()
+    results = []
+    for bench in (
+        bench_api_reads,
+        bench_api_create,
+        bench_api_toggles,
+        bench_api_download,
+        bench_api_autocomplete,
+    ):
+        results.extend(bench(user, anon, auth, options))
+    return results
+
+
+def bench_search(options):
+    # full-text search against icontains scan over the same recipes
+    _, _, auth = get_api_clients()
+    recipe = Recipe.objects.order_by('-pub_date').first()
+    word = recipe.name.split()[0].lower()
+    slug = Tag.objects.values_list('slug', flat=True).first()
+    total = Recipe.objects.count()
+    results = []
+    for name, params in (
+        ('common word', {'search': word}),
+        ('exact name', {'search': recipe.name}),
+        ('two words', {'search': f'{word} {recipe.text.split()[-1]}'}),
+        ('with tag', {'search': word, 'tags': slug}),
+        ('by date', {'search': word, 'ordering': '-pub_date'}),
+    ):
+        results.append(
+            {
+                'name': f'search {name}[{total} recipes]',
+                **measure_request(
+                    auth,
+                    'get',
+                    f'/api/recipes/?limit=6&{urlencode(params)}',
+                    options,
+                ),
+            }
+        )
+    # the same page of exact name as before search was added
+    scan = Recipe.objects.filter(
+        Q(name__icontains=recipe.name) | Q(text__icontains=recipe.name)
+    ).order_by('-pub_date')
+    results.append(
+        {
+            'name': f'icontains exact name[{total} recipes]',
+            **measure(
+                lambda: (scan.count(), list(scan.values_list('id')[:6])),
+                options['repeat'],
+            ),
+        }
+    )
+    return results
+
+
+def fetch_json(url, headers):
+    try:
+        with urlopen(Request(url, headers=headers), timeout=10) as response:
+            return json.loads(response.read())
+    except (HTTPError, URLError) as error:
+        raise CommandError(f'{url}: {error}')
+
+
+def get_load_urls(base, headers, authenticated):
+    recipes = fetch_json(f'{base}/api/recipes/?limit=50', headers)['results']
+    tags = fetch_json(f'{base}/api/tags/', headers)
+    urls = ['/api/recipes/?limit=6', '/api/recipes/?limit=6&cursor=']
+    urls += [f'/api/recipes/?limit=6&tags={tag["slug"]}' for tag in tags[:3]]
+    urls += [f'/api/recipes/{recipe["id"]}/' for recipe in recipes[:10]]
+    urls += [
+        '/api/ingredients/?name=' + quote(recipe['ingredients'][0]['name'][:2])
+        for recipe in recipes[:10]
+        if recipe['ingredients']
+    ]
+    if authenticated:
+        urls += [
+            '/api/recipes/feed/?limit=6',
+            '/api/users/subscriptions/?limit=6&recipes_limit=3',
+            '/api/recipes/download_shopping_cart/?format=txt',
+        ]
+    return urls
+
+
+def load_worker(urls, headers, deadline, seed, latencies, errors):
+    rnd = random.Random(seed)
+    while time.perf_counter() < deadline:
+        start = time.perf_counter()
+        try:
+            with urlopen(
+                Request(rnd.choice(urls), headers=headers), timeout=30
+            ) as response:
+                response.read()
+        except HTTPError as error:
+            errors[error.code] += 1
+        except URLError as error:
+            errors[str(error.reason)] += 1
+        # list.append is atomic, so lists are shared between threads
+        latencies.append(time.perf_counter() - start)
+
+
+def bench_load(options):
+    # Load of running server (runserver/gunicorn) from several threads
+    # with mix of read requests, f.e. --url http://127.0.0.1:8000
+    if not options['url']:
+        raise CommandError('Для сценария load укажите --url сервера')
+    base = options['url'].rstrip('/')
+    headers = {}
+    if options['token']:
+        headers['Authorization'] = f'Token {options["token"]}'
+    urls = [
+        base + url
+        for url in get_load_urls(base, headers, bool(options['token']))
+    ]
+    latencies = []
+    errors = [Counter() for _ in range(options['concurrency'])]
+    deadline = time.perf_counter() + options['duration']
+    threads = [
+        threading.Thread(
+            target=load_worker,
+            args=(urls, headers, deadline, seed, latencies, errors[seed]),
+        )
+        for seed in range(options['concurrency'])
+    ]
+    start = time.perf_counter()
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+    elapsed = time.perf_counter() - start
+    if not latencies:
+        raise CommandError('Не выполнено ни одного запроса')
+    latencies.sort()
+    return [
+        {
+            'name': f'mix[{len(urls)} urls, {len(threads)} threads]',
+            'requests': len(latencies),
+            'rps': len(latencies) / elapsed,
+            **{
+                f'p{percent}_ms': percentile(latencies, percent) * 1000
+                for percent in (50, 95, 99)
+            },
+            'errors': sum(sum(counter.values()) for counter in errors),
+        }
+    ]
+
+
+def get_commit():
+    try:
+        return subprocess.run(
+            ['git', 'rev-parse', '--short', 'HEAD'],
+            cwd=settings.BASE_DIR,
+            capture_output=True,
+            text=True,
+            check=True,
+        ).stdout.strip()
+    except (OSError, subprocess.CalledProcessError):
+        return None
+
+
+SCENARIO_TO_METHOD_MAP = [
+    ('shopping_list_formats', bench_shopping_list_formats),
+    ('ingredient_autocomplete', bench_ingredient_autocomplete),
+    ('api', bench_api),
+    ('search', bench_search),
+    ('loadcsv', bench_loadcsv),
+    ('load', bench_load),
+]
+# scenarios which change DB or need data or running server are started only
+# by name
+DESTRUCTIVE_SCENARIOS = ('api', 'search', 'loadcsv', 'load')
+
+
+class Command(BaseCommand):
+    help = 'Замер производительности горячих участков API'
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            'scenarios',
+            nargs='*',
+            help='Сценарии для запуска (по умолчанию все)',
+        )
+        parser.add_argument(
+            '--repeat',
+            type=int,
+            default=20,
+            help='Количество повторов каждого замера',
+        )
+        parser.add_argument(
+            '--data-dir',
+            default=os.path.join(settings.BASE_DIR.parent, 'data'),
+            help='Путь до директории с csv файлами',
+        )
+        parser.add_argument(
+            '--rows',
+            type=int,
+            default=100000,
+            help='Размер синтетических данных для сценария loadcsv',
+        )
+        parser.add_argument(
+            '--allow-flush',
+            action='store_true',
+            help='Разрешить очистку БД в сценарии loadcsv и для --seed-rows',
+        )
+        parser.add_argument(
+            '--seed-rows',
+            type=int,
+            default=0,
+            help=(
+                'Очистить БД и загрузить синтетические данные такого '
+                'размера перед замерами'
+            ),
+        )
+        parser.add_argument(
+            '--cold',
+            action='store_true',
+            help='Очищать кеш перед каждым запросом сценария api',
+        )
+        parser.add_argument(
+            '--output',
+            help='Сохранить результаты в json файл для сравнения коммитов',
+        )
+        parser.add_argument(
+            '--url', help='Адрес запущенного сервера для сценария load'
+        )
+        parser.add_argument(
+            '--token', help='Токен пользователя для сценария load'
+        )
+        parser.add_argument(
+            '--concurrency',
+            type=int,
+            default=8,
+            help='Количество потоков сценария load',
+        )
+        parser.add_argument(
+            '--duration',
+            type=int,
+            default=10,
+            help='Длительность сценария load в секундах',
+        )
+
+    def seed(self, rows):
+        if not self.options['allow_flush']:
+            raise CommandError(
+                '--seed-rows очищает БД, добавьте --allow-flush'
+            )
+        with tempfile.TemporaryDirectory() as csv_dir:
+            generate_dataset(csv_dir, rows)
+            run_manage('flush', '--noinput')
+            run_manage('loadcsv', csv_dir)
+
+    def handle(self, *args, **options):
+        known = dict(SCENARIO_TO_METHOD_MAP)
+        scenarios = options['scenarios'] or [
+            name for name in known if name not in DESTRUCTIVE_SCENARIOS
+        ]
+        unknown = set(scenarios) - set(known)
+        if unknown:
+            raise CommandError(
+                f'Неизвестные сценарии: {", ".join(sorted(unknown))}. '
+                f'Доступны: {", ".join(known)}'
+            )
+        self.options = options
+        if options['seed_rows']:
+            self.seed(options['seed_rows'])
+        report = {
+            'commit': get_commit(),
+            'date': datetime.now(timezone.utc).isoformat(),
+            'python': platform.python_version(),
+            'database': connection.vendor,
+            'repeat': options['repeat'],
+            'cold': options['cold'],
+            'scenarios': {},
+        }
+        for scenario in scenarios:
+            self.stdout.write(self.style.SUCCESS(scenario))
+            results = known[scenario](options)
+            report['scenarios'][scenario] = results
+            for result in results:
+                metrics = '  '.join(
+                    f'{key} {value:10.3f}'
+                    for key, value in result.items()
+                    if key != 'name'
+                )
+                self.stdout.write(f'  {result["name"]:<32} {metrics}')
+        if options['output']:
+            with open(options['output'], 'w', encoding='utf-8') as f:
+                json.dump(report, f, ensure_ascii=False, indent=2)
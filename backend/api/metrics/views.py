@@ -0,0 +1,18 @@
+from rest_framework import permissions
+from rest_framework.decorators import api_view, permission_classes
+from rest_framework.response import Response
+
+from api.common.instrumentation import endpoint_stats
+from api.common.recipe_cache import cache_stats
+
+
+@api_view(['GET'])
+@permission_classes((permissions.IsAdminUser,))
+def metrics(request):
+    # NOTE: numbers are collected by every process separately
+    return Response(
+        {
+            'endpoints': endpoint_stats.report(),
+            'recipe_cache': cache_stats.snapshot(),
+        }
+    )
@@ -0,0 +1,66 @@
+from django.db import transaction
+
+from api.common.batch import (
+    ABSENT,
+    ADDED,
+    EXISTS,
+    NOT_FOUND,
+    REMOVED,
+    get_statuses,
+    lock_user,
+)
+from foodgram.cache_versions import COUNTERS_GENERATION, bump_generation
+from recipes import shopping_list
+from recipes.models import Recipe, ShoppingCart
+
+
+def _split_ids(model, user, ids):
+    found = set(Recipe.objects.filter(id__in=ids).values_list('id', flat=True))
+    stored = set(
+        model.objects.filter(user=user, recipe_id__in=found).values_list(
+            'recipe_id', flat=True
+        )
+    )
+    return found, stored
+
+
+def _finish(ids, outcomes):
+    # NOTE: counters are recounted instead of changed by delta, because
+    # concurrent request could insert or delete the same rows
+    Recipe.objects.filter(id__in=ids).recount()
+    transaction.on_commit(lambda: bump_generation(COUNTERS_GENERATION))
+    return get_statuses(ids, outcomes)
+
+
+@transaction.atomic
+def add_recipes(model, user, ids):
+    # Favorite and ShoppingCart have unique (user, recipe), so rows added
+    # without the lock (admin) are skipped by database instead of
+    # IntegrityError
+    lock_user(user)
+    found, stored = _split_ids(model, user, ids)
+    model.objects.bulk_create(
+        (model(user=user, recipe_id=pk) for pk in found - stored),
+        ignore_conflicts=True,
+    )
+    # NOTE: bulk_create does not send post_save, see recipes/signals.py.
+    # Rows were selected after the lock, so only inserted rows are added.
+    if model is ShoppingCart:
+        shopping_list.add_recipes(user.id, found - stored)
+    outcomes = {pk: ADDED for pk in found - stored}
+    outcomes.update({pk: EXISTS for pk in stored})
+    outcomes.update({pk: NOT_FOUND for pk in set(ids) - found})
+    return _finish(ids, outcomes)
+
+
+@transaction.atomic
+def remove_recipes(model, user, ids):
+    lock_user(user)
+    found, stored = _split_ids(model, user, ids)
+    # NOTE: shopping list and counters are changed by signals of every
+    # deleted row, see recipes/signals.py
+    model.objects.filter(user=user, recipe_id__in=stored).delete()
+    outcomes = {pk: REMOVED for pk in stored}
+    outcomes.update({pk: ABSENT for pk in found - stored})
+    outcomes.update({pk: NOT_FOUND for pk in set(ids) - found})
+    return _finish(ids, outcomes)
@@ -0,0 +1,120 @@
+from django.conf import settings
+from django.core.cache import cache
+from django.http import Http404
+from rest_framework.response import Response
+
+from foodgram.cache_versions import (
+    USERS_GENERATION,
+    get_catalog_version,
+    get_generations,
+    recipe_generation,
+)
+from ingredients.models import Ingredient
+from recipes.models import Favorite, Recipe, ShoppingCart
+from tags.models import Tag
+from users.models import Follow
+from .serializers import RecipeReadSerializer
+
+FRAGMENT_KEY = 'recipe-fragment:{id}:{host}:{variant}:{generations}'
+
+
+def get_fragments(recipe_ids, request, preview):
+    # Serialized recipes without user state (as for anonymous user).
+    # Missing fragments are serialized with one set of queries for all.
+    generations = get_generations(
+        [recipe_generation(pk) for pk in recipe_ids] + [USERS_GENERATION]
+    )
+    common = [
+        generations.pop(),
+        get_catalog_version(Tag),
+        get_catalog_version(Ingredient),
+    ]
+    keys = {
+        pk: FRAGMENT_KEY.format(
+            id=pk,
+            host=request.get_host(),
+            variant='preview' if preview else 'image',
+            generations='-'.join(map(str, [generation] + common)),
+        )
+        for pk, generation in zip(recipe_ids, generations)
+    }
+    cached = cache.get_many(keys.values())
+    fragments = {pk: cached[key] for pk, key in keys.items() if key in cached}
+    missing = [pk for pk in recipe_ids if pk not in fragments]
+    if missing:
+        recipes = Recipe.objects.with_related().filter(id__in=missing)
+        serializer = RecipeReadSerializer(
+            recipes,
+            many=True,
+            context={'request': request, 'preview': preview},
+        )
+        built = {data['id']: data for data in serializer.data}
+        cache.set_many(
+            {keys[pk]: data for pk, data in built.items()},
+            settings.RECIPE_CACHE_TIMEOUT,
+        )
+        fragments.update(built)
+    # recipe could be deleted after page was selected
+    return [fragments[pk] for pk in recipe_ids if pk in fragments]
+
+
+def overlay_user_state(fragments, user):
+    # user flags are loaded by one query for every flag for whole page,
+    # anonymous user has all flags unset without queries
+    favorited = in_shopping_cart = subscribed = set()
+    if not user.is_anonymous and fragments:
+        recipe_ids = [fragment['id'] for fragment in fragments]
+        author_ids = {fragment['author']['id'] for fragment in fragments}
+        favorited = set(
+            Favorite.objects.filter(
+                user=user, recipe_id__in=recipe_ids
+            ).values_list('recipe_id', flat=True)
+        )
+        in_shopping_cart = set(
+            ShoppingCart.objects.filter(
+                user=user, recipe_id__in=recipe_ids
+            ).values_list('recipe_id', flat=True)
+        )
+        subscribed = set(
+            Follow.objects.filter(
+                user=user, author_id__in=author_ids
+            ).values_list('author_id', flat=True)
+        )
+    return [
+        dict(
+            fragment,
+            author=dict(
+                fragment['author'],
+                is_subscribed=fragment['author']['id'] in subscribed,
+            ),
+            is_favorited=fragment['id'] in favorited,
+            is_in_shopping_cart=fragment['id'] in in_shopping_cart,
+        )
+        for fragment in fragments
+    ]
+
+
+class RecipeFragmentMixin:
+    # NOTE: list/retrieve select only ids of recipes, bodies are taken from
+    # fragments cache shared by all users and user flags are added on top.
+
+    def get_recipes_data(self, recipes):
+        fragments = get_fragments(
+            [recipe.id for recipe in recipes],
+            self.request,
+            self.get_serializer_context()['preview'],
+        )
+        return overlay_user_state(fragments, self.request.user)
+
+    def list(self, request, *args, **kwargs):
+        queryset = self.filter_queryset(self.get_queryset())
+        page = self.paginate_queryset(queryset)
+        if page is None:
+            return Response(self.get_recipes_data(list(queryset)))
+        return self.get_paginated_response(self.get_recipes_data(page))
+
+    def retrieve(self, request, *args, **kwargs):
+        data = self.get_recipes_data([self.get_object()])
+        if not data:
+            raise Http404
+        return Response(data[0])
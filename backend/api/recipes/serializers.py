@@ -1,10 +1,13 @@
-from django.shortcuts import get_object_or_404
+from django.db import transaction
+from django.http import Http404
 from rest_framework import serializers
 
-from api.common.serializer_fields import Base64ImageField
+from api.common.serializer_fields import Base64ImageField, PreviewImageField
 from api.tags.serializers import TagSerializer
-from api.users.serializers import UserSerializer
+from api.users.serializers import AuthorSerializer
 from ingredients.models import Ingredient
+from recipes import shopping_list
+from recipes.images import schedule_preview
 from recipes.models import Favorite, Recipe, UsedIngredient
 from tags.models import Tag
 
@@ -24,14 +27,14 @@ class UsedIngredientReadSerializer(serializers.ModelSerializer):
 
 
 class RecipeReadSerializer(serializers.ModelSerializer):
+    # NOTE: recipe data is shared by all users (see api/recipes/fragments),
+    # is_favorited and is_in_shopping_cart are added by overlay_user_state.
     image = Base64ImageField(required=True, allow_null=False)
-    is_favorited = serializers.SerializerMethodField()
-    is_in_shopping_cart = serializers.SerializerMethodField()
     tags = TagSerializer(required=True, many=True)
     ingredients = UsedIngredientReadSerializer(
         source='recipe', required=True, many=True
     )
-    author = UserSerializer(required=True, many=False)
+    author = AuthorSerializer(required=True, many=False)
 
     class Meta:
         model = Recipe
@@ -44,16 +47,15 @@ class RecipeReadSerializer(serializers.ModelSerializer):
             'text',
             'cooking_time',
             'author',
-            'is_favorited',
-            'is_in_shopping_cart',
         )
         read_only_fields = ('pub_date',)
 
-    def get_is_favorited(self, obj):
-        return Recipe.is_favorited(obj, self.context['request'].user.id)
-
-    def get_is_in_shopping_cart(self, obj):
-        return Recipe.is_in_shopping_cart(obj, self.context['request'].user.id)
+    def get_fields(self):
+        fields = super().get_fields()
+        # lists show preview, full image is returned for single recipe
+        if self.context.get('preview'):
+            fields['image'] = PreviewImageField()
+        return fields
 
 
 class RecipeWriteSerializer(serializers.ModelSerializer):
@@ -71,39 +73,57 @@ class RecipeWriteSerializer(serializers.ModelSerializer):
 
     class Meta:
         model = Recipe
-        fields = '__all__'
+        # internal fields are not a part of API
+        exclude = ('preview', 'favorites_count', 'in_carts_count')
         read_only_fields = (
             'author',
             'pub_date',
         )
 
     def validate_ingredients(self, value):
-        unique_ingredients = []
         if len(value) < 0:
             raise serializers.ValidationError(
                 'Нельзя создать рецепт без ингредиентов.'
             )
-        for data_ingredient in value:
-            ingredient = get_object_or_404(
-                Ingredient, id=data_ingredient.get('id')
+        try:
+            ids = [int(data.get('id')) for data in value]
+            amounts = [int(data.get('amount')) for data in value]
+        except (AttributeError, TypeError, ValueError):
+            raise serializers.ValidationError(
+                'Некорректный идентификатор или количество ингредиента.'
             )
-            if ingredient in unique_ingredients:
+        # one query for all ingredients, found objects are passed further to
+        # create/update, so they do not fetch ingredients again
+        db_ingredients = Ingredient.objects.in_bulk(ids)
+        validated_ingredients = []
+        unique_ids = set()
+        for ingredient_id, amount in zip(ids, amounts):
+            ingredient = db_ingredients.get(ingredient_id)
+            if ingredient is None:
+                raise Http404(f'Ингредиент {ingredient_id} не найден.')
+            if ingredient_id in unique_ids:
                 raise serializers.ValidationError(
                     f'Дублируется {ingredient.name}, пожалуйста оставьте один'
                     ' ингредиент.'
                 )
-            unique_ingredients.append(ingredient)
-            if int(data_ingredient.get('amount')) < 0:
+            unique_ids.add(ingredient_id)
+            if amount < 0:
                 raise serializers.ValidationError(
                     'Вы ввели некорректное значение ('
-                    f'{data_ingredient.get("amount")}) для {ingredient.name}'
+                    f'{amount}) для {ingredient.name}'
                 )
-        return value
+            validated_ingredients.append(
+                {
+                    'ingredient': ingredient,
+                    'amount': amount,
+                }
+            )
+        return validated_ingredients
 
     def to_representation(self, instance):
         serialized_ingredients = [
             {
-                'id': ingredient.ingredient.id,
+                'id': ingredient.ingredient_id,
                 'amount': ingredient.amount,
             }
             for ingredient in instance.recipe.all()
@@ -115,50 +135,59 @@ class RecipeWriteSerializer(serializers.ModelSerializer):
 
         return serialized_data
 
+    @transaction.atomic
     def create(self, validated_data):
         tags = validated_data.pop('tags')
         ingredients = validated_data.pop('ingredients')
         recipe = Recipe.objects.create(**validated_data)
-        for tag in tags:
-            recipe.tags.add(tag)
-        for ingredient in ingredients:
-            db_ingredient = get_object_or_404(
-                Ingredient, id=ingredient.get('id')
-            )
-            UsedIngredient.objects.create(
-                **{
-                    'recipe': recipe,
-                    'amount': ingredient['amount'],
-                    'ingredient': db_ingredient,
-                }
-            )
+        recipe.tags.set(tags)
+        UsedIngredient.objects.bulk_create(
+            UsedIngredient(recipe=recipe, **ingredient)
+            for ingredient in ingredients
+        )
+        schedule_preview(recipe)
         return recipe
 
+    @transaction.atomic
     def update(self, instance, validated_data):
         tags = validated_data.pop('tags')
         instance.tags.set(tags)
 
-        ingredients = validated_data.pop('ingredients')
-        for ingr in instance.ingredients.all():
-            used_ingr = UsedIngredient.objects.get(
-                recipe=instance, ingredient=ingr
-            )
-            used_ingr.delete()
-        for ingredient in ingredients:
-            db_ingredient = get_object_or_404(
-                Ingredient, id=ingredient.get('id')
-            )
-            UsedIngredient.objects.create(
-                **{
-                    'recipe': instance,
-                    'amount': ingredient['amount'],
-                    'ingredient': db_ingredient,
-                }
+        ingredients = {
+            ingredient['ingredient'].id: ingredient
+            for ingredient in validated_data.pop('ingredients')
+        }
+        # update only difference between stored and new ingredients, the
+        # same difference is applied to shopping lists with the recipe
+        deltas = {pk: data['amount'] for pk, data in ingredients.items()}
+        removed_ingredients = []
+        changed_ingredients = []
+        for used in UsedIngredient.objects.filter(recipe=instance):
+            deltas[used.ingredient_id] = (
+                deltas.get(used.ingredient_id, 0) - used.amount
             )
+            data = ingredients.pop(used.ingredient_id, None)
+            if data is None:
+                removed_ingredients.append(used.id)
+            elif used.amount != data['amount']:
+                used.amount = data['amount']
+                changed_ingredients.append(used)
+        UsedIngredient.objects.filter(id__in=removed_ingredients).delete()
+        UsedIngredient.objects.bulk_update(changed_ingredients, ('amount',))
+        UsedIngredient.objects.bulk_create(
+            UsedIngredient(recipe=instance, **ingredient)
+            for ingredient in ingredients.values()
+        )
+        shopping_list.change_recipe(instance.id, deltas)
 
-        return super(RecipeWriteSerializer, self).update(
+        if 'image' in validated_data:
+            instance.preview = ''
+        instance = super(RecipeWriteSerializer, self).update(
             instance, validated_data
         )
+        if 'image' in validated_data:
+            schedule_preview(instance)
+        return instance
 
 
 class FavoriteSerializer(serializers.ModelSerializer):
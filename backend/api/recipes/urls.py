@@ -4,6 +4,7 @@ from rest_framework.routers import DefaultRouter
 from .views import (
     RecipeViewSet,
     download_ingredients,
+    get_shopping_list,
 )
 
 router = DefaultRouter()
@@ -11,5 +12,6 @@ router.register(r'', RecipeViewSet, basename='recipes')
 
 urlpatterns = [
     path('download_shopping_cart/', download_ingredients),
+    path('shopping_list/', get_shopping_list),
     path('', include(router.urls)),
 ]
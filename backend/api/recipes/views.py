@@ -1,17 +1,32 @@
+from urllib.parse import quote
+
 from django.contrib.auth import get_user_model
-from django.db.models import F, Sum
-from django.http import FileResponse
+from django.db import transaction
+from django.http import FileResponse, StreamingHttpResponse
 from django.shortcuts import get_object_or_404
 from django_filters.rest_framework import DjangoFilterBackend
 from rest_framework import filters, permissions, status
-from rest_framework.decorators import action, api_view
+from rest_framework.decorators import action, api_view, renderer_classes
+from rest_framework.exceptions import ValidationError
+from rest_framework.renderers import JSONRenderer
 from rest_framework.response import Response
 
+from api.common.batch import get_batch_ids, lock_user
 from api.common.filters import RecipeFilter
 from api.common.mixins import DenyPutViewSet
+from api.common.recipe_cache import AnonymousCacheMixin
+from api.common.renderers import CSVRenderer, PDFRenderer, PlainTextRenderer
 from api.common.serializers import ShortRecipeSerializer
-from api.common.utils import generate_pdf_file
-from recipes.models import Favorite, Recipe, ShoppingCart, UsedIngredient
+from api.common.utils import (
+    SHOPPING_LIST_STREAMS,
+    format_shopping_list_line,
+    get_shopping_list_pdf,
+)
+from recipes import shopping_list
+from recipes.models import Favorite, Recipe, ShoppingCart
+from recipes.timeline import get_feed
+from .batch import add_recipes, remove_recipes
+from .fragments import RecipeFragmentMixin
 from .serializers import (
     FavoriteSerializer,
     RecipeReadSerializer,
@@ -21,13 +36,39 @@ from .serializers import (
 User = get_user_model()
 
 
-class RecipeViewSet(DenyPutViewSet):
+class RecipeViewSet(AnonymousCacheMixin, RecipeFragmentMixin, DenyPutViewSet):
     queryset = Recipe.objects.all()
     filter_backends = (
         DjangoFilterBackend,
         filters.OrderingFilter,
     )
     filterset_class = RecipeFilter
+    ordering_fields = (
+        'id',
+        'name',
+        'cooking_time',
+        'pub_date',
+        'favorites_count',
+        'in_carts_count',
+    )
+
+    @property
+    def keyset_ordering(self):
+        if self.action == 'feed':
+            return ('-feed_date', '-id')
+        return ('-pub_date', '-id')
+
+    def get_queryset(self):
+        # only ids are selected, see RecipeFragmentMixin
+        if self.action in ('list', 'retrieve'):
+            return Recipe.objects.only('id', 'author', 'pub_date')
+        if self.action == 'feed':
+            return (
+                get_feed(self.request.user)
+                .only('id', 'author', 'pub_date')
+                .order_by('-feed_date', '-id')
+            )
+        return super().get_queryset()
 
     def get_permissions(self):
         if self.action in ('list', 'retrieve'):
@@ -39,46 +80,73 @@ class RecipeViewSet(DenyPutViewSet):
     def get_serializer_class(self):
         if self.action in ('create', 'partial_update'):
             return RecipeWriteSerializer
-        elif self.action in ('list', 'retrieve'):
+        elif self.action in ('list', 'retrieve', 'feed'):
             return RecipeReadSerializer
 
+    def get_serializer_context(self):
+        context = super().get_serializer_context()
+        context['preview'] = self.action in ('list', 'feed')
+        return context
+
     def perform_create(self, serializer):
         serializer.save(author=self.request.user)
 
     def get_recipe(self):
         return get_object_or_404(Recipe, id=self.kwargs.get('pk'))
 
+    @action(detail=False)
+    def feed(self, request):
+        return self.list(request)
+
+    def add_recipe(self, model, error):
+        # NOTE: get_or_create instead of exists() check and create, so
+        # concurrent requests do not fail with IntegrityError
+        recipe = self.get_recipe()
+        with transaction.atomic():
+            # the same lock as in batch actions, see api/common/batch.py
+            lock_user(self.request.user)
+            _, created = model.objects.get_or_create(
+                user=self.request.user, recipe=recipe
+            )
+            if not created:
+                raise ValidationError(error)
+        return recipe
+
+    def remove_recipe(self, model, error):
+        recipe = self.get_recipe()
+        with transaction.atomic():
+            lock_user(self.request.user)
+            deleted, _ = model.objects.filter(
+                user=self.request.user, recipe=recipe
+            ).delete()
+            if not deleted:
+                raise ValidationError(error)
+        return recipe
+
     @action(
         methods=['POST'],
         detail=True,
     )
     def favorite(self, request, **kwargs):
-        user = request.user
         input_serializer = FavoriteSerializer(
-            user, data=request.data, context={'request': request}
+            request.user, data=request.data, context={'request': request}
         )
         input_serializer.is_valid(raise_exception=True)
-        recipe = self.get_recipe()
+        recipe = self.add_recipe(
+            Favorite, 'Уже находится в избранных рецептах'
+        )
         output_serializer = ShortRecipeSerializer(
             recipe, context={'request': request}
         )
-        output_serializer.validate({'favorite'})
-        Favorite.objects.create(user=user, recipe=recipe)
         return Response(output_serializer.data, status=status.HTTP_200_OK)
 
     @favorite.mapping.delete
     def delete_favorite(self, request, **kwargs):
-        user = request.user
         serializer = FavoriteSerializer(
-            user, data=request.data, context={'request': request}
+            request.user, data=request.data, context={'request': request}
         )
         serializer.is_valid(raise_exception=True)
-        recipe = self.get_recipe()
-        output_serializer = ShortRecipeSerializer(
-            recipe, context={'request': request}
-        )
-        output_serializer.validate({'favorite'})
-        Favorite.objects.get(user=user, recipe=recipe).delete()
+        self.remove_recipe(Favorite, 'Рецепт не найден в избранных рецептах')
         return Response(status=status.HTTP_204_NO_CONTENT)
 
     @action(
@@ -86,45 +154,90 @@ class RecipeViewSet(DenyPutViewSet):
         detail=True,
     )
     def shopping_cart(self, request, **kwargs):
-        user = request.user
-        recipe = self.get_recipe()
+        recipe = self.add_recipe(
+            ShoppingCart, 'Рецепт уже добавлен в корзину покупок'
+        )
         serializer = ShortRecipeSerializer(
             recipe, context={'request': request}
         )
-        serializer.validate({'shopping'})
-        ShoppingCart.objects.create(user=user, recipe=recipe)
         return Response(serializer.data, status=status.HTTP_200_OK)
 
     @shopping_cart.mapping.delete
     def remove_from_shopping_cart(self, request, **kwargs):
-        user = request.user
-        recipe = self.get_recipe()
+        recipe = self.remove_recipe(
+            ShoppingCart, 'Рецепта нет в корзине покупок'
+        )
         serializer = ShortRecipeSerializer(
             recipe, context={'request': request}
         )
-        serializer.validate({'shopping'})
-        ShoppingCart.objects.get(user=user, recipe=recipe).delete()
         return Response(serializer.data, status=status.HTTP_200_OK)
 
+    # NOTE: batch actions take {"ids": [...]} and return status of every
+    # recipe: added/exists/not_found or removed/absent/not_found
 
-@api_view(['GET'])
-def download_ingredients(request):
-    used_ingredients = UsedIngredient.objects.filter(
-        recipe__shopping_recipe__user=request.user
+    @action(
+        methods=['POST'],
+        detail=False,
+        url_path='favorite',
+        url_name='favorite-batch',
     )
-    result = used_ingredients.values(
-        'ingredient__name', 'ingredient__measurement_unit'
-    ).annotate(
-        name=F('ingredient__name'),
-        measurement_unit=F('ingredient__measurement_unit'),
-        amount=Sum('amount'),
+    def favorite_batch(self, request):
+        results = add_recipes(Favorite, request.user, get_batch_ids(request))
+        return Response({'results': results}, status=status.HTTP_200_OK)
+
+    @favorite_batch.mapping.delete
+    def delete_favorite_batch(self, request):
+        results = remove_recipes(
+            Favorite, request.user, get_batch_ids(request)
+        )
+        return Response({'results': results}, status=status.HTTP_200_OK)
+
+    @action(
+        methods=['POST'],
+        detail=False,
+        url_path='shopping_cart',
+        url_name='shopping-cart-batch',
     )
-    output_text = []
-    for res in result:
-        output_text.append(
-            f'{res["name"]} ({res["measurement_unit"]}) - {res["amount"]}'
+    def shopping_cart_batch(self, request):
+        results = add_recipes(
+            ShoppingCart, request.user, get_batch_ids(request)
+        )
+        return Response({'results': results}, status=status.HTTP_200_OK)
+
+    @shopping_cart_batch.mapping.delete
+    def remove_from_shopping_cart_batch(self, request):
+        results = remove_recipes(
+            ShoppingCart, request.user, get_batch_ids(request)
         )
-    result = generate_pdf_file(output_text)
+        return Response({'results': results}, status=status.HTTP_200_OK)
+
+
+@api_view(['GET'])
+@renderer_classes((PDFRenderer, PlainTextRenderer, CSVRenderer, JSONRenderer))
+def download_ingredients(request):
+    result = shopping_list.get_items(request.user)
+    output_format = request.accepted_renderer.format
+    if output_format in SHOPPING_LIST_STREAMS:
+        response = StreamingHttpResponse(
+            SHOPPING_LIST_STREAMS[output_format](iter(result)),
+            content_type=(
+                f'{request.accepted_renderer.media_type}; charset=utf-8'
+            ),
+        )
+        response['Content-Disposition'] = (
+            "attachment; filename*=utf-8''"
+            f'{quote(f"Список_покупок.{output_format}")}'
+        )
+        return response
+
+    output_text = [format_shopping_list_line(res) for res in result]
+    result = get_shopping_list_pdf(request.user.id, output_text)
     return FileResponse(
         result, as_attachment=True, filename='Список_покупок.pdf'
     )
+
+
+@api_view(['GET'])
+def get_shopping_list(request):
+    # materialized shopping list is read by index, so it could be polled
+    return Response(shopping_list.get_items(request.user))
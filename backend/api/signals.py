@@ -0,0 +1,77 @@
+from django.contrib.auth import get_user_model
+from django.db import transaction
+from django.db.models.signals import m2m_changed, post_delete, post_save
+from django.dispatch import receiver
+
+from foodgram.cache_versions import (
+    COUNTERS_GENERATION,
+    LIST_GENERATION,
+    USERS_GENERATION,
+    bump_catalog_version,
+    bump_generation,
+    bump_recipe,
+)
+from ingredients.models import Ingredient
+from recipes.models import Favorite, Recipe, ShoppingCart, UsedIngredient
+from tags.models import Tag
+
+User = get_user_model()
+
+
+@receiver(post_save, sender=Ingredient)
+@receiver(post_delete, sender=Ingredient)
+@receiver(post_save, sender=Tag)
+@receiver(post_delete, sender=Tag)
+def bump_catalog(sender, **kwargs):
+    bump_catalog_version(sender)
+
+
+# NOTE: generations are bumped after commit, otherwise response with old
+# data could be cached with new generation before transaction is finished.
+
+
+@receiver(post_save, sender=Recipe)
+@receiver(post_delete, sender=Recipe)
+def bump_recipe_cache(sender, instance, **kwargs):
+    recipe_id = instance.id
+    transaction.on_commit(lambda: bump_recipe(recipe_id))
+
+
+@receiver(post_save, sender=UsedIngredient)
+@receiver(post_delete, sender=UsedIngredient)
+def bump_recipe_ingredients_cache(sender, instance, **kwargs):
+    recipe_id = instance.recipe_id
+    transaction.on_commit(lambda: bump_recipe(recipe_id))
+
+
+@receiver(m2m_changed, sender=Recipe.tags.through)
+def bump_recipe_tags_cache(sender, instance, action, reverse, **kwargs):
+    if not action.startswith('post_'):
+        return
+    if not reverse:
+        recipe_id = instance.id
+        transaction.on_commit(lambda: bump_recipe(recipe_id))
+        return
+    # recipes of tag were changed, for clear they are not known
+    recipe_ids = kwargs.get('pk_set')
+    if not recipe_ids:
+        transaction.on_commit(lambda: bump_generation(LIST_GENERATION))
+    for recipe_id in recipe_ids or ():
+        transaction.on_commit(lambda pk=recipe_id: bump_recipe(pk))
+
+
+@receiver(post_save, sender=Favorite)
+@receiver(post_delete, sender=Favorite)
+@receiver(post_save, sender=ShoppingCart)
+@receiver(post_delete, sender=ShoppingCart)
+def bump_counters_cache(sender, **kwargs):
+    transaction.on_commit(lambda: bump_generation(COUNTERS_GENERATION))
+
+
+@receiver(post_save, sender=User)
+@receiver(post_delete, sender=User)
+def bump_users_cache(sender, update_fields=None, **kwargs):
+    # last_login is updated on every login, it's not shown in recipes
+    if update_fields is not None and set(update_fields) == {'last_login'}:
+        return
+    transaction.on_commit(lambda: bump_generation(USERS_GENERATION))
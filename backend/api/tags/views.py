@@ -1,11 +1,12 @@
 from rest_framework import permissions
 
+from api.common.catalog import CatalogCacheMixin
 from api.common.mixins import ListRetrieveViewSet
 from tags.models import Tag
 from .serializers import TagSerializer
 
 
-class TagsViewSet(ListRetrieveViewSet):
+class TagsViewSet(CatalogCacheMixin, ListRetrieveViewSet):
     serializer_class = TagSerializer
     permission_classes = (permissions.AllowAny,)
     queryset = Tag.objects.all()
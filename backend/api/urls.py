@@ -1,6 +1,7 @@
 from django.urls import include, path
 
 from .ingredients.urls import urlpatterns as ingredients_patterns
+from .metrics.urls import urlpatterns as metrics_patterns
 from .recipes.urls import urlpatterns as recipes_patterns
 from .tags.urls import urlpatterns as tags_patterns
 from .users.urls import urlpatterns as users_patterns
@@ -11,4 +12,5 @@ urlpatterns = [
     path('recipes/', include(recipes_patterns)),
     path('users/', include(users_patterns)),
     path('auth/', include('djoser.urls.authtoken')),
+    path('metrics/', include(metrics_patterns)),
 ]
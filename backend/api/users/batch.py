@@ -0,0 +1,84 @@
+from django.contrib.auth import get_user_model
+from django.db import transaction
+
+from api.common.batch import (
+    ABSENT,
+    ADDED,
+    EXISTS,
+    NOT_FOUND,
+    REMOVED,
+    get_statuses,
+    lock_user,
+)
+from recipes import timeline
+from users.models import Follow
+
+User = get_user_model()
+
+# user could not follow himself (author_is_not_the_same_user constraint)
+SELF = 'self'
+
+
+def _split_ids(user, ids):
+    found = set(
+        User.objects.filter(id__in=ids)
+        .exclude(id=user.id)
+        .values_list('id', flat=True)
+    )
+    stored = set(
+        Follow.objects.filter(user=user, author_id__in=found).values_list(
+            'author_id', flat=True
+        )
+    )
+    return found, stored
+
+
+def _other_outcomes(user, ids, found):
+    outcomes = {pk: NOT_FOUND for pk in set(ids) - found}
+    if user.id in outcomes:
+        outcomes[user.id] = SELF
+    return outcomes
+
+
+@transaction.atomic
+def follow_authors(user, ids):
+    lock_user(user)
+    found, stored = _split_ids(user, ids)
+    added = found - stored
+    Follow.objects.bulk_create(
+        (Follow(user=user, author_id=pk) for pk in added),
+        ignore_conflicts=True,
+    )
+    # NOTE: bulk_create does not send post_save, so timeline is filled here.
+    # Rows were selected after the lock, so only inserted rows are added.
+    if added:
+        timeline.backfill(user.id, *added)
+    outcomes = _other_outcomes(user, ids, found)
+    outcomes.update({pk: ADDED for pk in added})
+    outcomes.update({pk: EXISTS for pk in stored})
+    return get_statuses(ids, outcomes)
+
+
+@transaction.atomic
+def unfollow_authors(user, ids):
+    lock_user(user)
+    found, stored = _split_ids(user, ids)
+    # NOTE: rows are deleted one by one, so post_delete of every row drops
+    # timeline entries of its author and sees the number of follows left
+    # (feed is rebuilt once, when user returns from pull mode)
+    for follow in Follow.objects.filter(user=user, author_id__in=stored):
+        follow.delete()
+    outcomes = _other_outcomes(user, ids, found)
+    outcomes.update({pk: REMOVED for pk in stored})
+    outcomes.update({pk: ABSENT for pk in found - stored})
+    return get_statuses(ids, outcomes)
+
+
+def get_follow_status(user, ids):
+    # one query by unique (user, author) index for all authors
+    subscribed = set(
+        Follow.objects.filter(user=user, author_id__in=ids).values_list(
+            'author_id', flat=True
+        )
+    )
+    return {str(pk): pk in subscribed for pk in ids}
@@ -45,8 +45,22 @@ class UserSerializer(ValidateUserSerializer, serializers.ModelSerializer):
         )
 
 
+class AuthorSerializer(UserSerializer):
+    # NOTE: recipe author without user state, is_subscribed is added by
+    # overlay_user_state in api/recipes/fragments.py
+    class Meta(UserSerializer.Meta):
+        fields = (
+            'id',
+            'username',
+            'email',
+            'first_name',
+            'last_name',
+        )
+
+
 class SubscribeSerializer(UserSerializer):
     recipes = ShortRecipeSerializer(many=True, source='recipe', required=False)
+    recipes_count = serializers.SerializerMethodField()
 
     # NOTE: looks like 'fields' and 'readonly_fields' should be displayed
     # together: https://docs.djangoproject.com/en/4.2/ref/contrib/admin/
@@ -64,6 +78,7 @@ class SubscribeSerializer(UserSerializer):
             'last_name',
             'is_subscribed',
             'recipes',
+            'recipes_count',
         )
         read_only_fields = (
             'id',
@@ -73,25 +88,14 @@ class SubscribeSerializer(UserSerializer):
             'last_name',
             'is_subscribed',
             'recipes',
+            'recipes_count',
         )
 
-    def validate(self, attrs):
-        method = self.context['request'].method
-        user = self.context['request'].user
-        author = self.instance
-        if user == author:
-            raise serializers.ValidationError(
-                'Нельзя подписаться/отписаться на/от самого себя'
-            )
-        subscription_exist = Follow.objects.filter(
-            user=user, author=author
-        ).exists()
-        if method == 'DELETE' and not subscription_exist:
-            raise serializers.ValidationError(
-                'Ошибка отписки: Вы не подписаны на этого автора.'
-            )
-        elif method == 'POST' and subscription_exist:
-            raise serializers.ValidationError(
-                'Вы уже подписаны на этого автора'
-            )
-        return attrs
+    def get_is_subscribed(self, obj):
+        # only followed authors are serialized (see get_authors)
+        return True
+
+    def get_recipes_count(self, obj):
+        if hasattr(obj, 'recipes_count'):
+            return obj.recipes_count
+        return obj.recipe.count()
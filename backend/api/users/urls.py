@@ -2,7 +2,12 @@ from django.urls import include, path, re_path
 from djoser.views import UserViewSet
 from rest_framework.routers import DefaultRouter
 
-from .views import SubscribeViewSet, SubscriptionsViewSet
+from .views import (
+    SubscribeViewSet,
+    SubscriptionsViewSet,
+    is_subscribed,
+    subscribe_batch,
+)
 
 router = DefaultRouter()
 router.register(
@@ -21,6 +26,9 @@ urlpatterns = [
         ),
         name='create_list_users',
     ),
+    # NOTE: before (?P<id>...) patterns, otherwise names are taken as ids
+    path('subscribe/', subscribe_batch, name='subscribe_batch'),
+    path('is_subscribed/', is_subscribed, name='is_subscribed'),
     path('', include(router.urls)),
     path('me/', UserViewSet.as_view({'get': 'me'}), name='me'),
     path(
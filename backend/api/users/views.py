@@ -1,22 +1,75 @@
 from django.contrib.auth import get_user_model
+from django.db import transaction
+from django.db.models import Count, OuterRef, Prefetch, Subquery
 from django.shortcuts import get_object_or_404
 from rest_framework import status
-from rest_framework.decorators import action
+from rest_framework.decorators import action, api_view
+from rest_framework.exceptions import ValidationError
 from rest_framework.response import Response
+from rest_framework.settings import api_settings
 from rest_framework.viewsets import ViewSet
 
+from api.common.batch import get_batch_ids, lock_user
 from api.common.mixins import ListViewSet
+from recipes.models import Recipe
 from users.models import Follow
+from .batch import follow_authors, get_follow_status, unfollow_authors
 from .serializers import SubscribeSerializer
 
 User = get_user_model()
+NON_FIELD_ERRORS_KEY = api_settings.NON_FIELD_ERRORS_KEY
+
+
+def get_recipes_limit(request):
+    recipes_limit = request.query_params.get('recipes_limit')
+    if recipes_limit is None:
+        return None
+    try:
+        recipes_limit = int(recipes_limit)
+    except ValueError:
+        recipes_limit = -1
+    if recipes_limit < 0:
+        raise ValidationError(
+            {'recipes_limit': 'Должно быть неотрицательным целым числом'}
+        )
+    return recipes_limit
+
+
+def get_authors(user, recipes_limit=None):
+    # Followed authors with annotated recipes_count. Only the last
+    # recipes_limit recipes are prefetched per author (correlated subquery
+    # with LIMIT, window functions could not be filtered in Django 3.2).
+    recipes = Recipe.objects.all()
+    if recipes_limit is not None:
+        recipes = recipes.filter(
+            id__in=Subquery(
+                Recipe.objects.filter(author=OuterRef('author')).values('id')[
+                    :recipes_limit
+                ]
+            )
+        )
+    return (
+        User.objects.filter(following__user=user)
+        .annotate(recipes_count=Count('recipe'))
+        .prefetch_related(Prefetch('recipe', queryset=recipes))
+        .order_by('id')
+    )
 
 
 class SubscribeViewSet(ViewSet):
     queryset = Follow.objects.all()
 
     def get_author(self):
-        return get_object_or_404(User, id=self.kwargs.get('id'))
+        author = get_object_or_404(User, id=self.kwargs.get('id'))
+        if author == self.request.user:
+            raise ValidationError(
+                {
+                    NON_FIELD_ERRORS_KEY: [
+                        'Нельзя подписаться/отписаться на/от самого себя'
+                    ]
+                }
+            )
+        return author
 
     @action(
         methods=['POST'],
@@ -26,44 +79,65 @@ class SubscribeViewSet(ViewSet):
     def subscribe(self, request, **kwargs):
         user = request.user
         author = self.get_author()
-        # pass context for correct work is_subscribed in User serializator
-        serializer = SubscribeSerializer(
-            author, data=request.data, context={'request': request}
-        )
-        serializer.is_valid(raise_exception=True)
-        Follow.objects.create(user=user, author=author)
-        # sorting number of recipes
-        recipes_limit = request.query_params.get('recipes_limit')
-        display_data = []
-        iteration_data = serializer.data
-        if isinstance(iteration_data, dict):
-            iteration_data = [iteration_data]
-
-        for author in iteration_data:
-            display_data.append(author.copy())
-            display_data[-1]['recipes_count'] = len(
-                display_data[-1]['recipes']
-            )
-            if recipes_limit is not None:
-                display_data[-1]['recipes'] = display_data[-1]['recipes'][
-                    : int(recipes_limit)
-                ]
-
-        return Response(display_data, status=status.HTTP_200_OK)
+        recipes_limit = get_recipes_limit(request)
+        # NOTE: get_or_create instead of exists() check and create, so
+        # concurrent requests do not fail with IntegrityError
+        with transaction.atomic():
+            # the same lock as in batch actions, see api/common/batch.py
+            lock_user(user)
+            _, created = Follow.objects.get_or_create(user=user, author=author)
+            if not created:
+                raise ValidationError(
+                    {
+                        NON_FIELD_ERRORS_KEY: [
+                            'Вы уже подписаны на этого автора'
+                        ]
+                    }
+                )
+        author = get_authors(user, recipes_limit).get(id=author.id)
+        serializer = SubscribeSerializer(author, context={'request': request})
+        return Response([serializer.data], status=status.HTTP_200_OK)
 
     @subscribe.mapping.delete
     def unsubscribe(self, request, **kwargs):
-        user = request.user
         author = self.get_author()
-        # pass context for correct work is_subscribed in User serializator
-        serializer = SubscribeSerializer(
-            author, data=request.data, context={'request': request}
-        )
-        serializer.is_valid(raise_exception=True)
-        Follow.objects.get(user=user, author=author).delete()
+        with transaction.atomic():
+            lock_user(request.user)
+            deleted, _ = Follow.objects.filter(
+                user=request.user, author=author
+            ).delete()
+            if not deleted:
+                raise ValidationError(
+                    {
+                        NON_FIELD_ERRORS_KEY: [
+                            'Ошибка отписки: Вы не подписаны на этого автора.'
+                        ]
+                    }
+                )
         return Response(status=status.HTTP_204_NO_CONTENT)
 
 
+# NOTE: batch subscribe takes {"ids": [...]} and returns status of every
+# author: added/exists/not_found/self or removed/absent/not_found/self
+@api_view(['POST', 'DELETE'])
+def subscribe_batch(request):
+    ids = get_batch_ids(request)
+    if request.method == 'POST':
+        results = follow_authors(request.user, ids)
+    else:
+        results = unfollow_authors(request.user, ids)
+    return Response({'results': results}, status=status.HTTP_200_OK)
+
+
+@api_view(['GET'])
+def is_subscribed(request):
+    # {"<author id>": true/false} for ?ids=1,2,3
+    return Response(
+        get_follow_status(request.user, get_batch_ids(request)),
+        status=status.HTTP_200_OK,
+    )
+
+
 # NOTE: ViewSet does not have paginate_queryset and I got error:
 # 'SubscriptionsViewSet' object has no attribute 'paginate_queryset'
 # It happens because:
@@ -72,26 +146,12 @@ class SubscribeViewSet(ViewSet):
 # - GenericViewSet extends simple ViewSet and adds paginate_queryset method
 class SubscriptionsViewSet(ListViewSet):
     queryset = Follow.objects.all()
+    keyset_ordering = ('id',)
 
     def list(self, request, *args, **kwargs):
-        authors = Follow.objects.filter(user=request.user).values_list(
-            'author', flat=True
-        )
-        queryset = User.objects.filter(id__in=authors).all()
+        queryset = get_authors(request.user, get_recipes_limit(request))
         page = self.paginate_queryset(queryset)
         serializer = SubscribeSerializer(
             page, many=True, context={'request': request}
         )
-        # sorting number of recipes
-        recipes_limit = request.query_params.get('recipes_limit')
-        display_data = []
-        for author in serializer.data:
-            display_data.append(author.copy())
-            display_data[-1]['recipes_count'] = len(
-                display_data[-1]['recipes']
-            )
-            if recipes_limit is not None:
-                display_data[-1]['recipes'] = display_data[-1]['recipes'][
-                    : int(recipes_limit)
-                ]
-        return self.get_paginated_response(display_data)
+        return self.get_paginated_response(serializer.data)
@@ -0,0 +1,69 @@
+import time
+
+from django.core.cache import cache
+
+# NOTE: versions of cached data are used by api caches and bumped by
+# domain apps too (management commands, image processing), so they are
+# not a part of api package.
+
+CATALOG_VERSION_KEY = 'catalog-version:{label}'
+GENERATION_KEY = 'recipe-cache-generation:{name}'
+# generations of cached data:
+# list - any recipe was changed, created or deleted
+# recipe:<id> - the recipe was changed or deleted
+# users - users were changed (authors are shown in recipes)
+# counters - favorites and shopping carts were changed (ordering by counts)
+LIST_GENERATION = 'list'
+USERS_GENERATION = 'users'
+COUNTERS_GENERATION = 'counters'
+
+
+def _version_key(model):
+    return CATALOG_VERSION_KEY.format(label=model._meta.label_lower)
+
+
+def get_catalog_version(model):
+    key = _version_key(model)
+    version = cache.get(key)
+    if version is None:
+        # NOTE: start from current time instead of 1, otherwise after cache
+        # restart workers could get the same version for old data.
+        cache.add(key, int(time.time() * 1000), None)
+        version = cache.get(key)
+    return version
+
+
+def bump_catalog_version(model):
+    key = _version_key(model)
+    try:
+        cache.incr(key)
+    except ValueError:
+        cache.add(key, int(time.time() * 1000), None)
+
+
+def recipe_generation(recipe_id):
+    return f'recipe:{recipe_id}'
+
+
+def get_generations(names):
+    keys = {GENERATION_KEY.format(name=name): name for name in names}
+    generations = cache.get_many(keys)
+    for key in keys:
+        if key not in generations:
+            # NOTE: time based start value, see get_catalog_version
+            cache.add(key, int(time.time() * 1000), None)
+            generations[key] = cache.get(key)
+    return [generations[key] for key in keys]
+
+
+def bump_generation(*names):
+    for name in names:
+        key = GENERATION_KEY.format(name=name)
+        try:
+            cache.incr(key)
+        except ValueError:
+            cache.add(key, int(time.time() * 1000), None)
+
+
+def bump_recipe(recipe_id):
+    bump_generation(LIST_GENERATION, recipe_generation(recipe_id))
@@ -38,6 +38,7 @@ INSTALLED_APPS = [
     'rest_framework.authtoken',
     'django_filters',
     'djoser',
+    'api',
     'ingredients',
     'recipes',
     'users',
@@ -45,6 +46,7 @@ INSTALLED_APPS = [
 ]
 
 MIDDLEWARE = [
+    'api.common.instrumentation.InstrumentationMiddleware',
     'django.middleware.security.SecurityMiddleware',
     'django.contrib.sessions.middleware.SessionMiddleware',
     'django.middleware.common.CommonMiddleware',
@@ -89,6 +91,18 @@ DATABASES = {
     }
 }
 
+# NOTE: versions of catalogs and cached responses are stored here, so for
+# several gunicorn workers it should be shared between them, f.e.
+# CACHE_BACKEND=django.core.cache.backends.filebased.FileBasedCache
+CACHES = {
+    'default': {
+        'BACKEND': os.getenv(
+            'CACHE_BACKEND', 'django.core.cache.backends.locmem.LocMemCache'
+        ),
+        'LOCATION': os.getenv('CACHE_LOCATION', ''),
+    }
+}
+
 
 # Password validation
 # https://docs.djangoproject.com/en/3.2/ref/settings/#auth-password-validators
@@ -169,6 +183,53 @@ MID_INT_LENGTH = 200
 
 MID_SMALL_INT_LENGTH = 150
 
+# shopping list pdf is drawn directly on canvas for lists longer than it
+SHOPPING_LIST_CANVAS_THRESHOLD = 50
+
+SHOPPING_LIST_CACHE_TIMEOUT = 60 * 60 * 24
+
+# lifetime of cached counts for keyset pagination
+PAGINATION_COUNT_CACHE_TIMEOUT = 60
+
+# per endpoint query count and timings, report is on /api/metrics/
+INSTRUMENTATION = bool(os.getenv('INSTRUMENTATION', False))
+
+# number of last requests of every endpoint kept for percentiles
+INSTRUMENTATION_SAMPLES = 1000
+
+# the same query repeated so many times in one request is reported as N+1
+INSTRUMENTATION_DUPLICATE_QUERIES = 5
+
+# lifetime of cached recipe responses for anonymous users, they are
+# invalidated on changes anyway
+RECIPE_CACHE_TIMEOUT = 60 * 5
+
+# max number of ids in batch favorite/shopping_cart/subscribe requests
+BATCH_MAX_SIZE = 100
+
+# max size of decoded recipe image in bytes
+RECIPE_IMAGE_MAX_SIZE = 5 * 1024 * 1024
+
+# previews of recipe images are made in background threads
+IMAGE_WORKERS = 2
+
+RECIPE_PREVIEW_SIZE = (480, 480)
+
+RECIPE_PREVIEW_QUALITY = 80
+
+# users following more authors read feed directly from recipes instead of
+# materialized timeline
+FEED_PULL_THRESHOLD = 1000
+
+FEED_BATCH_SIZE = 1000
+
+# max number of ingredients returned for autocomplete by name
+INGREDIENT_SEARCH_LIMIT = 50
+
+# pg_trgm GIN index for ingredient names (requires rights to create
+# extension in the database)
+INGREDIENT_TRIGRAM_INDEX = bool(os.getenv('INGREDIENT_TRIGRAM_INDEX', False))
+
 # NOTE: Disable extra djoser endpoints by setting AdminOnly permissions
 # https://stackoverflow.com/questions/54846372/djoser-disable-unused-endpoints
 # Also establish only necessary urls instead of full viewset
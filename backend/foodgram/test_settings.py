@@ -0,0 +1,19 @@
+import os
+import tempfile
+
+# settings require secret key, tests do not need real one
+os.environ.setdefault('SECRET_KEY', 'tests')
+
+from .settings import *  # noqa: E402,F401,F403
+
+# NOTE: tests use SQLite (search tests need FTS5 index), test database is
+# created in memory
+DATABASES = {
+    'default': {
+        'ENGINE': 'django.db.backends.sqlite3',
+        'NAME': BASE_DIR / 'test.sqlite3',  # noqa: F405
+    }
+}
+
+# uploaded and generated images of tests are not kept in project
+MEDIA_ROOT = tempfile.mkdtemp(prefix='foodgram-tests-')
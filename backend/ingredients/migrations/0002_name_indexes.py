@@ -0,0 +1,38 @@
+# Generated by Django 3.2 on 2026-10-18 17:47
+
+from django.conf import settings
+from django.db import migrations, models
+
+
+def create_trigram_index(apps, schema_editor):
+    if (
+        schema_editor.connection.vendor != 'postgresql'
+        or not settings.INGREDIENT_TRIGRAM_INDEX
+    ):
+        return
+    schema_editor.execute('CREATE EXTENSION IF NOT EXISTS pg_trgm')
+    schema_editor.execute(
+        'CREATE INDEX IF NOT EXISTS ingredient_name_trgm_idx '
+        'ON ingredients_ingredient USING gin (lower(name) gin_trgm_ops)'
+    )
+
+
+def drop_trigram_index(apps, schema_editor):
+    if schema_editor.connection.vendor != 'postgresql':
+        return
+    schema_editor.execute('DROP INDEX IF EXISTS ingredient_name_trgm_idx')
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('ingredients', '0001_initial'),
+    ]
+
+    operations = [
+        migrations.AddIndex(
+            model_name='ingredient',
+            index=models.Index(fields=['name'], name='ingredient_name_pattern_idx', opclasses=('varchar_pattern_ops',)),
+        ),
+        migrations.RunPython(create_trigram_index, drop_trigram_index),
+    ]
@@ -8,6 +8,16 @@ class Ingredient(models.Model):
     class Meta:
         verbose_name = 'Ингредиент'
         verbose_name_plural = 'Ингредиенты'
+        indexes = (
+            # NOTE: opclasses are used by PostgreSQL only, it allows to use
+            # index for LIKE 'prefix%' with non C locale. Other backends
+            # create simple index.
+            models.Index(
+                fields=('name',),
+                name='ingredient_name_pattern_idx',
+                opclasses=('varchar_pattern_ops',),
+            ),
+        )
 
     def __str__(self):
         return self.name
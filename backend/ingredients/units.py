@@ -0,0 +1,76 @@
+import threading
+from collections import defaultdict
+
+from foodgram.cache_versions import get_catalog_version
+from .models import Ingredient
+
+# units which are converted to each other: unit -> (base unit, factor)
+CONVERSIONS = {
+    'г': ('г', 1),
+    'кг': ('г', 1000),
+    'мл': ('мл', 1),
+    'л': ('мл', 1000),
+}
+
+
+def build_canonical_map():
+    # ingredient id -> (canonical id, base unit, factor) for ingredients
+    # which are present in catalog with different convertible units, e.g.
+    # "мука (г)" and "мука (кг)". Other ingredients are not changed.
+    groups = defaultdict(list)
+    for pk, name, unit in Ingredient.objects.filter(
+        measurement_unit__in=CONVERSIONS
+    ).values_list('id', 'name', 'measurement_unit'):
+        base, factor = CONVERSIONS[unit]
+        groups[(name.strip().lower(), base)].append((factor, pk))
+    canonical_map = {}
+    for (_, base), ingredients in groups.items():
+        if len({factor for factor, _ in ingredients}) < 2:
+            continue
+        # ingredient in base unit is canonical
+        _, canonical = min(ingredients)
+        for factor, pk in ingredients:
+            canonical_map[pk] = (canonical, base, factor)
+    return canonical_map
+
+
+class CanonicalUnits:
+    # canonical map of current catalog version kept in process memory
+    def __init__(self):
+        self._version = None
+        self._map = {}
+        self._lock = threading.Lock()
+
+    def get(self):
+        version = get_catalog_version(Ingredient)
+        with self._lock:
+            if version == self._version:
+                return self._map
+        canonical_map = build_canonical_map()
+        with self._lock:
+            self._version, self._map = version, canonical_map
+        return canonical_map
+
+
+canonical_units = CanonicalUnits()
+
+
+def merge_amounts(rows):
+    # Rows with id, name, measurement_unit and amount. Amounts of the same
+    # ingredient in different units are summed in base unit, order of rows
+    # is kept.
+    canonical_map = canonical_units.get()
+    merged = {}
+    for row in rows:
+        if row['id'] not in canonical_map:
+            merged[row['id']] = row
+            continue
+        canonical, base, factor = canonical_map[row['id']]
+        amount = row['amount'] * factor
+        if canonical in merged:
+            merged[canonical]['amount'] += amount
+        else:
+            merged[canonical] = dict(
+                row, id=canonical, measurement_unit=base, amount=amount
+            )
+    return list(merged.values())
@@ -4,6 +4,7 @@ from django.contrib import admin
 from django.core.exceptions import ValidationError
 from django.db.models import Q
 
+from . import shopping_list
 from .models import Favorite, Recipe, ShoppingCart
 
 
@@ -27,9 +28,11 @@ class RecipeAdmin(admin.ModelAdmin):
     list_filter = ('name', 'author', 'tags')
     empty_value_display = '-пусто-'
 
-    @admin.display(description='Добавлен в избранное (раз)')
+    @admin.display(
+        description='Добавлен в избранное (раз)', ordering='favorites_count'
+    )
     def favorite_score(self, obj):
-        return obj.count_favorites()
+        return obj.favorites_count
 
     @staticmethod
     def _add_to_used_ingredients(used_ingredients, objects, with_nested=True):
@@ -45,9 +48,7 @@ class RecipeAdmin(admin.ModelAdmin):
             # drop removed objects from instance
             for obj in formset.deleted_objects:
                 obj.delete()
-            changed_ingredients = [
-                obj[0] for obj in formset.changed_objects
-            ]
+            changed_ingredients = [obj[0] for obj in formset.changed_objects]
             # add changed
             self._add_to_used_ingredients(
                 used_ingredients, changed_ingredients
@@ -62,9 +63,7 @@ class RecipeAdmin(admin.ModelAdmin):
             )
 
         if len(used_ingredients) < 1:
-            raise ValidationError(
-                'Нельзя создать рецепт без ингредиентов.'
-            )
+            raise ValidationError('Нельзя создать рецепт без ингредиентов.')
         duplicate_ingredients = []
         for ingr, count in used_ingredients.items():
             if count > 1:
@@ -77,6 +76,14 @@ class RecipeAdmin(admin.ModelAdmin):
             )
 
         super(RecipeAdmin, self).save_formset(request, form, formset, change)
+        if change:
+            # ingredients are changed without deltas, so shopping lists with
+            # the recipe are aggregated again
+            shopping_list.rebuild(
+                *ShoppingCart.objects.filter(
+                    recipe=formset.instance
+                ).values_list('user_id', flat=True)
+            )
 
 
 @admin.register(ShoppingCart)
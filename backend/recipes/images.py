@@ -0,0 +1,57 @@
+import logging
+import os
+from concurrent.futures import ThreadPoolExecutor
+from io import BytesIO
+
+from django.conf import settings
+from django.core.files.base import ContentFile
+from django.db import close_old_connections, transaction
+from PIL import Image
+
+from foodgram.cache_versions import bump_recipe
+from .models import Recipe
+
+logger = logging.getLogger(__name__)
+
+# NOTE: previews are made out of request, so create/update of recipe does
+# not wait for image resizing
+executor = ThreadPoolExecutor(
+    max_workers=settings.IMAGE_WORKERS, thread_name_prefix='recipe-images'
+)
+
+
+def make_preview(recipe_id, image_name):
+    recipe = Recipe(id=recipe_id, image=image_name)
+    with recipe.image.open('rb') as image_file:
+        image = Image.open(image_file)
+        image.thumbnail(settings.RECIPE_PREVIEW_SIZE)
+        if image.mode not in ('RGB', 'RGBA'):
+            image = image.convert('RGBA')
+        content = BytesIO()
+        image.save(content, 'WEBP', quality=settings.RECIPE_PREVIEW_QUALITY)
+    name = os.path.splitext(os.path.basename(image_name))[0] + '.webp'
+    recipe.preview.save(name, ContentFile(content.getvalue()), save=False)
+    # image could be changed while preview was made
+    updated = Recipe.objects.filter(id=recipe_id, image=image_name).update(
+        preview=recipe.preview.name
+    )
+    if updated:
+        # update() does not send signals
+        bump_recipe(recipe_id)
+
+
+def _make_preview_task(recipe_id, image_name):
+    close_old_connections()
+    try:
+        make_preview(recipe_id, image_name)
+    except Exception:
+        logger.exception('Preview for recipe %s was not created', recipe_id)
+    finally:
+        close_old_connections()
+
+
+def schedule_preview(recipe):
+    recipe_id, image_name = recipe.id, recipe.image.name
+    transaction.on_commit(
+        lambda: executor.submit(_make_preview_task, recipe_id, image_name)
+    )
@@ -0,0 +1,72 @@
+import os
+from datetime import datetime, timedelta, timezone
+
+from django.core.management.base import BaseCommand, CommandError
+
+from recipes.models import Recipe
+
+IMAGE_FIELDS = ('image', 'preview')
+
+
+def walk(storage, directory):
+    if not storage.exists(directory):
+        return
+    directories, files = storage.listdir(directory)
+    for name in files:
+        yield f'{directory}/{name}'
+    for name in directories:
+        yield from walk(storage, f'{directory}/{name}')
+
+
+class Command(BaseCommand):
+    help = 'Удалить картинки, на которые не ссылается ни один рецепт'
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--dry-run',
+            action='store_true',
+            help='Только вывести файлы, которые будут удалены',
+        )
+        parser.add_argument(
+            '--min-age',
+            type=int,
+            default=24,
+            help=(
+                'Не удалять файлы моложе указанного числа часов (картинка '
+                'могла быть записана, а рецепт еще не сохранен)'
+            ),
+        )
+
+    def handle(self, *args, **options):
+        if options['min_age'] < 0:
+            raise CommandError('--min-age не может быть отрицательным')
+        created_before = datetime.now(timezone.utc) - timedelta(
+            hours=options['min_age']
+        )
+        removed = 0
+        size = 0
+        for field_name in IMAGE_FIELDS:
+            field = Recipe._meta.get_field(field_name)
+            storage = field.storage
+            used = set(
+                Recipe.objects.exclude(**{field_name: ''}).values_list(
+                    field_name, flat=True
+                )
+            )
+            directory = os.path.normpath(field.upload_to).replace('\\', '/')
+            for name in walk(storage, directory):
+                if name in used:
+                    continue
+                # reused files are touched on upload, see recipes/storage.py
+                if storage.get_modified_time(name) > created_before:
+                    continue
+                size += storage.size(name)
+                removed += 1
+                if options['dry_run']:
+                    self.stdout.write(name)
+                else:
+                    storage.delete(name)
+        action = 'Будет удалено' if options['dry_run'] else 'Удалено'
+        self.stdout.write(
+            self.style.SUCCESS(f'{action} файлов: {removed} ({size} байт)')
+        )
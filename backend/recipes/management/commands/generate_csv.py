@@ -0,0 +1,202 @@
+import csv
+import os
+import random
+from datetime import datetime, timedelta, timezone
+
+from django.core.management.base import BaseCommand, CommandError
+
+# password "-" as for users from data/users.csv
+PASSWORD = (
+    'pbkdf2_sha256$260000$YBnyAa2MeSLSgTAsJzyot3$'
+    'JWhYIKc7Q/eLkeIjXGYXp5st3jncW56bJjnFUHB8qUA='
+)
+IMAGE = 'images/temp_qh2Ip01.jpeg'
+UNITS = ('г', 'кг', 'мл', 'л', 'шт.', 'ст. л.', 'ч. л.', 'по вкусу')
+WORDS = (
+    'суп',
+    'салат',
+    'пирог',
+    'каша',
+    'рагу',
+    'соус',
+    'паста',
+    'омлет',
+    'курица',
+    'говядина',
+    'рыба',
+    'грибы',
+    'томаты',
+    'сыр',
+    'рис',
+    'лук',
+)
+
+
+def write_csv(path, header, rows):
+    with open(path, 'w', newline='', encoding='utf-8') as csvfile:
+        writer = csv.writer(csvfile)
+        writer.writerow(header)
+        writer.writerows(rows)
+
+
+def ingredients(count, rnd):
+    for idx in range(1, count + 1):
+        yield f'ингредиент {idx}', rnd.choice(UNITS)
+
+
+def tags(count, rnd):
+    for idx in range(1, count + 1):
+        yield idx, f'Тег {idx}', f'tag{idx}', f'#{rnd.randrange(1 << 24):06x}'
+
+
+def users(count, rnd):
+    for idx in range(1, count + 1):
+        yield (
+            idx,
+            f'user{idx}',
+            f'user{idx}@foodgram.fake',
+            f'Имя{idx}',
+            f'Фамилия{idx}',
+            PASSWORD,
+        )
+
+
+def pairs(count, left, right, rnd, skip_same=False):
+    # unique pairs without keeping them in memory: every left id gets
+    # consecutive right ids starting from random offset
+    per_left = max(count // left, 1)
+    if per_left > right - skip_same:
+        raise CommandError('Слишком много связей для заданного числа строк')
+    produced = 0
+    for left_id in range(1, left + 1):
+        offset = rnd.randrange(right)
+        taken = 0
+        step = 0
+        while taken < per_left and produced < count:
+            right_id = (offset + step) % right + 1
+            step += 1
+            if skip_same and right_id == left_id:
+                continue
+            yield left_id, right_id
+            taken += 1
+            produced += 1
+
+
+def recipes(count, users_count, tags_count, ingredients_count, rnd):
+    start = datetime(2023, 1, 1, tzinfo=timezone.utc)
+    for idx in range(1, count + 1):
+        tag_ids = rnd.sample(range(1, tags_count + 1), min(3, tags_count))
+        ingr_ids = rnd.sample(
+            range(1, ingredients_count + 1), min(8, ingredients_count)
+        )
+        yield (
+            rnd.randint(1, users_count),
+            f'{rnd.choice(WORDS)} {idx}'.capitalize(),
+            ' '.join(rnd.choices(WORDS, k=30)),
+            rnd.randint(1, 180),
+            ';'.join(map(str, tag_ids)),
+            IMAGE,
+            ';'.join(f'{ingr}-{rnd.randint(1, 500)}' for ingr in ingr_ids),
+            (start + timedelta(minutes=idx)).isoformat(),
+        )
+
+
+class Command(BaseCommand):
+    help = (
+        'Сгенерировать csv файлы в формате директории data для загрузки '
+        'командой loadcsv в пустую БД'
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            'output_dir', type=str, help='Директория для csv файлов'
+        )
+        for name, default in (
+            ('ingredients', 2000),
+            ('tags', 20),
+            ('users', 10000),
+            ('follows', 100000),
+            ('recipes', 100000),
+            ('favorites', 1000000),
+        ):
+            parser.add_argument(
+                f'--{name}',
+                type=int,
+                default=default,
+                help=f'Количество строк в {name}.csv',
+            )
+        parser.add_argument('--seed', type=int, default=0)
+
+    def handle(self, *args, **options):
+        output_dir = options['output_dir']
+        os.makedirs(output_dir, exist_ok=True)
+        rnd = random.Random(options['seed'])
+        files = (
+            (
+                'ingredients',
+                ('name', 'measurement_unit'),
+                ingredients(options['ingredients'], rnd),
+            ),
+            (
+                'tags',
+                ('id', 'name', 'slug', 'color'),
+                tags(options['tags'], rnd),
+            ),
+            (
+                'users',
+                (
+                    'id',
+                    'username',
+                    'email',
+                    'first_name',
+                    'last_name',
+                    'password',
+                ),
+                users(options['users'], rnd),
+            ),
+            (
+                'follows',
+                ('user', 'author'),
+                pairs(
+                    options['follows'],
+                    options['users'],
+                    options['users'],
+                    rnd,
+                    skip_same=True,
+                ),
+            ),
+            (
+                'recipes',
+                (
+                    'author',
+                    'name',
+                    'text',
+                    'cooking_time',
+                    'tags',
+                    'image',
+                    'ingredients',
+                    'pub_date',
+                ),
+                recipes(
+                    options['recipes'],
+                    options['users'],
+                    options['tags'],
+                    options['ingredients'],
+                    rnd,
+                ),
+            ),
+            (
+                'favorites',
+                ('user', 'recipe'),
+                pairs(
+                    options['favorites'],
+                    options['users'],
+                    options['recipes'],
+                    rnd,
+                ),
+            ),
+        )
+        for name, header, rows in files:
+            write_csv(os.path.join(output_dir, f'{name}.csv'), header, rows)
+            self.stdout.write(f'{name}.csv записан')
+        self.stdout.write(self.style.SUCCESS('Генерация завершена'))
@@ -1,9 +1,24 @@
 import csv
+import io
 import os
+import time
+from concurrent.futures import FIRST_COMPLETED, ThreadPoolExecutor, wait
+from itertools import islice
 
 from django.contrib.auth import get_user_model
+from django.core.management import call_command
 from django.core.management.base import BaseCommand, CommandError
+from django.core.management.color import no_style
+from django.db import connection, transaction
+from django.db.models import Max
 
+from foodgram.cache_versions import (
+    COUNTERS_GENERATION,
+    LIST_GENERATION,
+    USERS_GENERATION,
+    bump_catalog_version,
+    bump_generation,
+)
 from ingredients.models import Ingredient
 from recipes.models import Favorite, Recipe, UsedIngredient
 from tags.models import Tag
@@ -11,84 +26,211 @@ from users.models import Follow
 
 User = get_user_model()
 
+DEFAULT_BATCH_SIZE = 1000
 
-def get_ingredients(data):
-    obj_list = []
-    for idx, row in enumerate(data, start=1):
-        row['id'] = idx
-        obj_list.append(Ingredient(**row))
-    Ingredient.objects.bulk_create(obj_list)
 
+def chunks(iterable, size):
+    # rows are read from csv lazily, only one chunk is kept in memory
+    iterator = iter(iterable)
+    chunk = list(islice(iterator, size))
+    while chunk:
+        yield chunk
+        chunk = list(islice(iterator, size))
 
-def get_tags(data):
-    obj_list = [Tag(**row) for row in data]
-    Tag.objects.bulk_create(obj_list)
 
+def bulk_create(model, objects, batch_size, progress):
+    for chunk in chunks(objects, batch_size):
+        model.objects.bulk_create(chunk)
+        progress(len(chunk))
 
-def get_users(data):
-    obj_list = [User(**row) for row in data]
-    User.objects.bulk_create(obj_list)
+
+def check_ids(model, ids, known=None):
+    ids = {int(obj_id) for obj_id in ids}
+    if known is not None:
+        ids -= known
+    if not ids:
+        return
+    found = set(model.objects.filter(id__in=ids).values_list('id', flat=True))
+    missing = ids - found
+    if missing:
+        raise CommandError(
+            f'{model._meta.verbose_name_plural}: не найдены записи с id '
+            f'{sorted(missing)[:10]}'
+        )
 
 
-def get_follows(data):
-    users = {}  # id: user
-    obj_list = []
-    for row in data:
-        for key in ('author', 'user'):
-            user_id = row[key]
-            if user_id not in users:
-                users[user_id] = User.objects.get(id=user_id)
-            row[key] = users[user_id]
-        obj_list.append(Follow(**row))
-    Follow.objects.bulk_create(obj_list)
+def get_ingredients(data, batch_size, progress):
+    obj_list = (
+        Ingredient(id=idx, **row) for idx, row in enumerate(data, start=1)
+    )
+    bulk_create(Ingredient, obj_list, batch_size, progress)
 
 
-def get_recipes(data):
-    users = {}  # id: user
-    tags = {}  # id: tag
-    for row in data:
-        user_id = row['author']
-        if user_id not in users:
-            users[user_id] = User.objects.get(id=user_id)
-        row['author'] = users[user_id]
+def get_tags(data, batch_size, progress):
+    obj_list = (Tag(**row) for row in data)
+    bulk_create(Tag, obj_list, batch_size, progress)
 
-        tag_ids = row.pop('tags', '').split(';')
-        ingredients = row.pop('ingredients').split(';')
-        created_recipe = Recipe.objects.create(**row)
 
-        for tag_id in tag_ids:
-            if tag_id not in tags:
-                tags[tag_id] = Tag.objects.get(id=tag_id)
-            created_recipe.tags.add(tags[tag_id])
+def get_users(data, batch_size, progress):
+    obj_list = (User(**row) for row in data)
+    bulk_create(User, obj_list, batch_size, progress)
 
-        for ingr in ingredients:
-            ingredient_id, amount = ingr.split('-')
-            ingr_data = {
-                'recipe': created_recipe,
-                'ingredient': Ingredient.objects.get(id=ingredient_id),
-                'amount': amount,
-            }
-            UsedIngredient.objects.create(**ingr_data)
 
+def get_follows(data, batch_size, progress):
+    for rows in chunks(data, batch_size):
+        check_ids(
+            User, [row[key] for row in rows for key in ('author', 'user')]
+        )
+        Follow.objects.bulk_create(
+            Follow(user_id=row['user'], author_id=row['author'])
+            for row in rows
+        )
+        progress(len(rows))
+
+
+def get_recipes(data, batch_size, progress):
+    # tags and ingredients are small catalogs, they are checked once
+    tag_ids = set(Tag.objects.values_list('id', flat=True))
+    ingredient_ids = set(Ingredient.objects.values_list('id', flat=True))
+    # NOTE: bulk_create does not return ids on every DB backend, so ids are
+    # assigned here. Sequences are reset after loading.
+    next_id = (Recipe.objects.aggregate(max_id=Max('id'))['max_id'] or 0) + 1
+    for rows in chunks(data, batch_size):
+        recipes = []
+        recipe_tags = []
+        used_ingredients = []
+        for recipe_id, row in enumerate(rows, start=next_id):
+            tags = row.pop('tags', '').split(';')
+            ingrs = [
+                ingr.split('-') for ingr in row.pop('ingredients').split(';')
+            ]
+            check_ids(Tag, tags, tag_ids)
+            check_ids(
+                Ingredient, [ingr_id for ingr_id, _ in ingrs], ingredient_ids
+            )
+            author_id = row.pop('author')
+            recipes.append(Recipe(id=recipe_id, author_id=author_id, **row))
+            recipe_tags.extend(
+                Recipe.tags.through(recipe_id=recipe_id, tag_id=tag_id)
+                for tag_id in tags
+            )
+            used_ingredients.extend(
+                UsedIngredient(
+                    recipe_id=recipe_id, ingredient_id=ingr_id, amount=amount
+                )
+                for ingr_id, amount in ingrs
+            )
+        next_id += len(rows)
+        check_ids(User, [recipe.author_id for recipe in recipes])
+        Recipe.objects.bulk_create(recipes)
+        Recipe.tags.through.objects.bulk_create(recipe_tags)
+        UsedIngredient.objects.bulk_create(
+            used_ingredients, batch_size=batch_size
+        )
+        progress(len(rows))
+
+
+def get_favorites(data, batch_size, progress):
+    for rows in chunks(data, batch_size):
+        check_ids(User, [row['user'] for row in rows])
+        check_ids(Recipe, [row['recipe'] for row in rows])
+        Favorite.objects.bulk_create(
+            Favorite(user_id=row['user'], recipe_id=row['recipe'])
+            for row in rows
+        )
+        progress(len(rows))
+    Recipe.objects.recount()
 
-def get_favorites(data):
-    users = {}  # id: user
-    recipes = {}  # id: recipe
-    obj_list = []
-    for row in data:
-        user_id = row['user']
-        if user_id not in users:
-            users[user_id] = User.objects.get(id=user_id)
-        row['user'] = users[user_id]
 
-        recipe_id = row['recipe']
-        if recipe_id not in recipes:
-            recipes[recipe_id] = Recipe.objects.get(id=recipe_id)
-        row['recipe'] = recipes[recipe_id]
+class CSVStream:
+    # File-like object for COPY FROM STDIN, it renders rows to csv on demand
+    def __init__(self, rows, progress, batch_size):
+        self.rows = iter(rows)
+        self.progress = progress
+        self.batch_size = batch_size
+        self.buffer = io.StringIO()
+        self.writer = csv.writer(self.buffer)
+        self.pending = ''
+        self.counter = 0
 
-        obj_list.append(Favorite(**row))
+    def _fill(self, size):
+        for row in self.rows:
+            self.writer.writerow(row)
+            self.counter += 1
+            if self.counter == self.batch_size:
+                self.progress(self.counter)
+                self.counter = 0
+            if self.buffer.tell() >= size:
+                break
+        else:
+            if self.counter:
+                self.progress(self.counter)
+                self.counter = 0
+        self.pending += self.buffer.getvalue()
+        self.buffer.seek(0)
+        self.buffer.truncate()
 
-    Favorite.objects.bulk_create(obj_list)
+    def read(self, size=-1):
+        if size < 0:
+            size = 1 << 16
+        if len(self.pending) < size:
+            self._fill(size)
+        chunk, self.pending = self.pending[:size], self.pending[size:]
+        return chunk
+
+
+def copy_rows(model, columns, rows, batch_size, progress):
+    table = connection.ops.quote_name(model._meta.db_table)
+    columns = ', '.join(connection.ops.quote_name(col) for col in columns)
+    with connection.cursor() as cursor:
+        cursor.copy_expert(
+            f'COPY {table} ({columns}) FROM STDIN WITH (FORMAT csv)',
+            CSVStream(rows, progress, batch_size),
+        )
+
+
+def copy_ingredients(data, batch_size, progress):
+    copy_rows(
+        Ingredient,
+        ('id', 'name', 'measurement_unit'),
+        (
+            (idx, row['name'], row['measurement_unit'])
+            for idx, row in enumerate(data, start=1)
+        ),
+        batch_size,
+        progress,
+    )
+
+
+def copy_tags(data, batch_size, progress):
+    copy_rows(
+        Tag,
+        ('id', 'name', 'slug', 'color'),
+        ((row['id'], row['name'], row['slug'], row['color']) for row in data),
+        batch_size,
+        progress,
+    )
+
+
+def copy_follows(data, batch_size, progress):
+    copy_rows(
+        Follow,
+        ('user_id', 'author_id'),
+        ((row['user'], row['author']) for row in data),
+        batch_size,
+        progress,
+    )
+
+
+def copy_favorites(data, batch_size, progress):
+    copy_rows(
+        Favorite,
+        ('user_id', 'recipe_id'),
+        ((row['user'], row['recipe']) for row in data),
+        batch_size,
+        progress,
+    )
+    Recipe.objects.recount()
 
 
 FILE_TO_METHOD_MAP = [
@@ -100,9 +242,55 @@ FILE_TO_METHOD_MAP = [
     ('favorites', get_favorites),
 ]
 
+# files which have to be loaded before the key file
+FILE_DEPENDENCIES = {
+    'follows': ('users',),
+    'recipes': ('ingredients', 'tags', 'users'),
+    'favorites': ('users', 'recipes'),
+}
+
+# PostgreSQL loads these files with COPY FROM STDIN, foreign keys and
+# constraints are checked by DB itself
+FILE_TO_COPY_METHOD_MAP = {
+    'ingredients': copy_ingredients,
+    'tags': copy_tags,
+    'follows': copy_follows,
+    'favorites': copy_favorites,
+}
 
-def load_data_from_csv(f_name, load_func, inst, csv_dir, errors):
-    # load ingredients
+# models with ids from csv files or assigned by loader
+SEQUENCE_MODELS = (Ingredient, Tag, User, Recipe)
+
+
+class Progress:
+    def __init__(self, inst, f_name, enabled):
+        self.inst = inst
+        self.f_name = f_name
+        self.enabled = enabled
+        self.rows = 0
+        self.started = time.monotonic()
+
+    @property
+    def rate(self):
+        return self.rows / max(time.monotonic() - self.started, 1e-6)
+
+    def __call__(self, rows):
+        self.rows += rows
+        if self.enabled:
+            self.inst.stdout.write(
+                f'{self.f_name}.csv: {self.rows} строк, '
+                f'{self.rate:.0f} строк/сек'
+            )
+
+    def finish(self):
+        self.inst.stdout.write(
+            f'{self.f_name}.csv загружен: {self.rows} строк за '
+            f'{time.monotonic() - self.started:.2f} сек '
+            f'({self.rate:.0f} строк/сек)'
+        )
+
+
+def load_data_from_csv(f_name, load_func, inst, csv_dir, errors, options):
     f_path = f'{csv_dir}/{f_name}.csv'
     if not os.path.exists(f_path):
         inst.stdout.write(
@@ -111,20 +299,98 @@ def load_data_from_csv(f_name, load_func, inst, csv_dir, errors):
                 f'{csv_dir}. Загрузка данных из него не выполнена.'
             )
         )
+        return True
+    progress = Progress(inst, f_name, options['progress'])
     with open(f_path, newline='', encoding='utf-8') as csvfile:
         try:
             data = csv.DictReader(csvfile, delimiter=',')
-            load_func(data)
+            # one transaction per file: file is loaded completely or not at
+            # all
+            with transaction.atomic():
+                load_func(data, options['batch_size'], progress)
         except Exception as exc:
             errors.append(
                 f'Во время загрузки из файла {f_name}.csv возникла '
                 f'ошибка: {exc}'
             )
+            return False
+    progress.finish()
+    return True
+
+
+def reset_sequences():
+    sql_list = connection.ops.sequence_reset_sql(no_style(), SEQUENCE_MODELS)
+    with connection.cursor() as cursor:
+        for sql in sql_list:
+            cursor.execute(sql)
+
 
+def load_file_in_thread(f_name, method, inst, csv_dir, errors, options):
+    start = time.monotonic()
+    try:
+        success = load_data_from_csv(
+            f_name, method, inst, csv_dir, errors, options
+        )
+        return success, start
+    finally:
+        # every thread has own DB connection
+        connection.close()
+
+
+def load_data_from_all_csv_files(inst, csv_dir, errors, options):
+    use_copy = connection.vendor == 'postgresql' and not options['no_copy']
+    methods = dict(FILE_TO_METHOD_MAP)
+    if use_copy:
+        methods.update(FILE_TO_COPY_METHOD_MAP)
+    waiting = [f_name for f_name, _ in FILE_TO_METHOD_MAP]
+    done = set()
+    running = {}  # future: f_name
+    started = time.monotonic()
+    stages = []  # (f_name, start, finish)
 
-def load_data_from_all_csv_files(inst, csv_dir, errors):
-    for f_name, method in FILE_TO_METHOD_MAP:
-        load_data_from_csv(f_name, method, inst, csv_dir, errors)
+    with ThreadPoolExecutor(max_workers=options['jobs']) as executor:
+        while waiting or running:
+            for f_name in list(waiting):
+                dependencies = FILE_DEPENDENCIES.get(f_name, ())
+                if not all(dep in done for dep in dependencies):
+                    continue
+                waiting.remove(f_name)
+                future = executor.submit(
+                    load_file_in_thread,
+                    f_name,
+                    methods[f_name],
+                    inst,
+                    csv_dir,
+                    errors,
+                    options,
+                )
+                running[future] = f_name
+            if not running:
+                # dependencies of waiting files were not loaded
+                for f_name in waiting:
+                    missing = [
+                        dep
+                        for dep in FILE_DEPENDENCIES[f_name]
+                        if dep not in done
+                    ]
+                    errors.append(
+                        f'Файл {f_name}.csv не загружен, так как не были '
+                        f'загружены файлы: {", ".join(missing)}'
+                    )
+                break
+            finished, _ = wait(running, return_when=FIRST_COMPLETED)
+            for future in finished:
+                f_name = running.pop(future)
+                success, start = future.result()
+                stages.append(
+                    (f_name, start - started, time.monotonic() - started)
+                )
+                if success:
+                    done.add(f_name)
+
+    inst.stdout.write('Этапы загрузки (начало - конец, сек):')
+    for f_name, start, finish in stages:
+        inst.stdout.write(f'  {f_name:<12} {start:8.2f} - {finish:8.2f}')
 
 
 class Command(BaseCommand):
@@ -134,6 +400,31 @@ class Command(BaseCommand):
         parser.add_argument(
             'csv_dir_path', type=str, help='Путь до директории с csv файлами'
         )
+        parser.add_argument(
+            '--batch-size',
+            type=int,
+            default=DEFAULT_BATCH_SIZE,
+            help='Количество строк в одном INSERT запросе',
+        )
+        parser.add_argument(
+            '--progress',
+            action='store_true',
+            help='Выводить прогресс загрузки после каждой пачки строк',
+        )
+        parser.add_argument(
+            '--no-copy',
+            action='store_true',
+            help='Не использовать COPY FROM STDIN для PostgreSQL',
+        )
+        parser.add_argument(
+            '--jobs',
+            type=int,
+            default=1,
+            help=(
+                'Количество файлов, загружаемых параллельно. Независимые '
+                'файлы загружаются одновременно (для SQLite оставьте 1)'
+            ),
+        )
 
     def handle(self, *args, **options):
         csv_dir = options['csv_dir_path']
@@ -142,8 +433,20 @@ class Command(BaseCommand):
                 f'Директория {csv_dir} не была найдена. '
                 'Попробуйте указать другой путь.'
             )
+        if options['batch_size'] < 1:
+            raise CommandError('--batch-size должен быть больше 0')
+        if options['jobs'] < 1:
+            raise CommandError('--jobs должен быть больше 0')
         errors = []
-        load_data_from_all_csv_files(self, csv_dir, errors)
+        load_data_from_all_csv_files(self, csv_dir, errors, options)
+        reset_sequences()
+        # bulk_create does not send signals, so catalogs are marked as
+        # changed here
+        for model in (Ingredient, Tag):
+            bump_catalog_version(model)
+        bump_generation(LIST_GENERATION, USERS_GENERATION, COUNTERS_GENERATION)
+        # the same for timelines of recipe feed
+        call_command('rebuild_timelines', stdout=self.stdout)
         if errors:
             raise CommandError('\n'.join(errors))
         self.stdout.write(
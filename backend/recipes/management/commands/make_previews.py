@@ -0,0 +1,20 @@
+from django.core.management.base import BaseCommand
+
+from recipes.images import make_preview
+from recipes.models import Recipe
+
+
+class Command(BaseCommand):
+    help = 'Создать превью картинок для рецептов, у которых их еще нет'
+
+    def handle(self, *args, **options):
+        recipes = Recipe.objects.filter(preview='').values_list('id', 'image')
+        count = 0
+        for recipe_id, image_name in recipes.iterator():
+            try:
+                make_preview(recipe_id, image_name)
+            except (OSError, ValueError) as error:
+                self.stderr.write(f'Рецепт {recipe_id}: {error}')
+                continue
+            count += 1
+        self.stdout.write(self.style.SUCCESS(f'Создано превью: {count}'))
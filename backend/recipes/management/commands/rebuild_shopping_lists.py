@@ -0,0 +1,44 @@
+from django.core.management.base import BaseCommand
+from django.db import transaction
+
+from recipes import shopping_list
+from recipes.models import ShoppingCart, ShoppingListItem
+
+
+class Command(BaseCommand):
+    help = (
+        'Проверить и пересобрать списки покупок (после загрузки данных '
+        'в обход сигналов или изменения ингредиентов напрямую в БД)'
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--check',
+            action='store_true',
+            help='Только найти списки, которые не совпадают с корзиной',
+        )
+
+    def handle(self, *args, **options):
+        users = (
+            ShoppingCart.objects.values_list('user_id', flat=True)
+            .union(ShoppingListItem.objects.values_list('user_id', flat=True))
+            .order_by('user_id')
+        )
+        checked = 0
+        broken = 0
+        for user_id in users:
+            checked += 1
+            with transaction.atomic():
+                if shopping_list.is_consistent(user_id):
+                    continue
+                broken += 1
+                if options['check']:
+                    self.stdout.write(f'Пользователь {user_id}: не совпадает')
+                    continue
+                shopping_list.rebuild(user_id)
+        result = 'не совпадают' if options['check'] else 'пересобраны'
+        self.stdout.write(
+            self.style.SUCCESS(
+                f'Проверено списков: {checked}, {result}: {broken}'
+            )
+        )
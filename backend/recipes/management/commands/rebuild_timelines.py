@@ -0,0 +1,31 @@
+from django.core.management.base import BaseCommand
+from django.db import transaction
+
+from recipes import timeline
+from recipes.models import TimelineEntry
+from users.models import Follow
+
+
+class Command(BaseCommand):
+    help = (
+        'Пересобрать ленты рецептов подписок (после загрузки данных '
+        'в обход сигналов, например командой loadcsv)'
+    )
+
+    def handle(self, *args, **options):
+        TimelineEntry.objects.exclude(
+            user_id__in=Follow.objects.values('user_id')
+        ).delete()
+        users = (
+            Follow.objects.order_by('user_id')
+            .values_list('user_id', flat=True)
+            .distinct()
+        )
+        count = 0
+        for user_id in users.iterator():
+            with transaction.atomic():
+                timeline.rebuild(user_id)
+            count += 1
+        self.stdout.write(
+            self.style.SUCCESS(f'Ленты пересобраны для {count} пользователей')
+        )
@@ -0,0 +1,18 @@
+from django.core.management.base import BaseCommand
+
+from foodgram.cache_versions import COUNTERS_GENERATION, bump_generation
+from recipes.models import Recipe
+
+
+class Command(BaseCommand):
+    help = (
+        'Пересчитать количество добавлений рецептов в избранное и в корзину '
+        'покупок'
+    )
+
+    def handle(self, *args, **options):
+        updated = Recipe.objects.recount()
+        bump_generation(COUNTERS_GENERATION)
+        self.stdout.write(
+            self.style.SUCCESS(f'Счетчики пересчитаны для {updated} рецептов')
+        )
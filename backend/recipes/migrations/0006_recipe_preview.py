@@ -0,0 +1,18 @@
+# Generated by Django 3.2 on 2026-10-18 17:56
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('recipes', '0005_timeline'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='recipe',
+            name='preview',
+            field=models.ImageField(blank=True, editable=False, upload_to='previews/', verbose_name='Превью картинки'),
+        ),
+    ]
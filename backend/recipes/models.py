@@ -1,9 +1,12 @@
 from django.contrib.auth import get_user_model
 from django.core.validators import MinValueValidator
 from django.db import models
+from django.db.models import Count, F, OuterRef, Prefetch, Subquery
+from django.db.models.functions import Coalesce
 
 from ingredients.models import Ingredient
 from tags.models import Tag
+from .storage import ContentAddressedStorage
 
 User = get_user_model()
 
@@ -13,6 +16,39 @@ User = get_user_model()
 # model.
 
 
+class RecipeQuerySet(models.QuerySet):
+    def with_related(self):
+        return self.select_related('author').prefetch_related(
+            'tags',
+            Prefetch(
+                'recipe',
+                queryset=UsedIngredient.objects.select_related('ingredient'),
+            ),
+        )
+
+    def recount(self):
+        return self.update(
+            favorites_count=_count_subquery(Favorite),
+            in_carts_count=_count_subquery(ShoppingCart),
+        )
+
+    def change_counter(self, field, delta):
+        return self.update(**{field: F(field) + delta})
+
+
+def _count_subquery(model):
+    return Coalesce(
+        Subquery(
+            model.objects.filter(recipe=OuterRef('pk'))
+            .order_by()
+            .values('recipe')
+            .annotate(count=Count('pk'))
+            .values('count')
+        ),
+        0,
+    )
+
+
 class Recipe(models.Model):
     author = models.ForeignKey(
         User,
@@ -27,6 +63,15 @@ class Recipe(models.Model):
     image = models.ImageField(
         'Картинка',
         upload_to='images/',
+        storage=ContentAddressedStorage(),
+    )
+    # small WebP copy of image for lists, see recipes/images.py
+    preview = models.ImageField(
+        'Превью картинки',
+        upload_to='previews/',
+        storage=ContentAddressedStorage(),
+        blank=True,
+        editable=False,
     )
     text = models.TextField('Описание')
     tags = models.ManyToManyField(Tag)
@@ -41,6 +86,23 @@ class Recipe(models.Model):
     pub_date = models.DateTimeField(
         auto_now_add=True, verbose_name='Дата публикации', db_index=True
     )
+    # NOTE: denormalized counters, they are changed by signals of Favorite
+    # and ShoppingCart rows (see recipes/signals.py) and recounted after bulk
+    # changes. Use "recount_recipes" command to repair them.
+    favorites_count = models.PositiveIntegerField(
+        'Добавлен в избранное (раз)',
+        default=0,
+        editable=False,
+        db_index=True,
+    )
+    in_carts_count = models.PositiveIntegerField(
+        'Добавлен в корзину покупок (раз)',
+        default=0,
+        editable=False,
+        db_index=True,
+    )
+
+    objects = RecipeQuerySet.as_manager()
 
     class Meta:
         verbose_name = 'Рецепт'
@@ -50,17 +112,6 @@ class Recipe(models.Model):
     def __str__(self):
         return self.name
 
-    @staticmethod
-    def is_favorited(recipe, user):
-        return Favorite.objects.filter(recipe=recipe, user=user).exists()
-
-    @staticmethod
-    def is_in_shopping_cart(recipe, user):
-        return ShoppingCart.objects.filter(recipe=recipe, user=user).exists()
-
-    def count_favorites(self):
-        return Favorite.objects.filter(recipe=self).count()
-
 
 class UsedIngredient(models.Model):
     amount = models.PositiveIntegerField(
@@ -146,3 +197,107 @@ class ShoppingCart(models.Model):
 
     def __str__(self):
         return f'{self.recipe} в списке покупок у {self.user}'
+
+
+class ShoppingListItem(models.Model):
+    # NOTE: materialized shopping list, total amounts of ingredients of
+    # recipes in shopping cart. Rows are changed by deltas when recipes are
+    # added/removed or ingredients of recipe are changed, see
+    # recipes/shopping_list.py.
+    user = models.ForeignKey(
+        User,
+        on_delete=models.CASCADE,
+        related_name='shopping_list',
+        verbose_name='Пользователь',
+    )
+    ingredient = models.ForeignKey(
+        Ingredient,
+        on_delete=models.CASCADE,
+        related_name='shopping_list_items',
+        verbose_name='Ингредиент',
+    )
+    amount = models.IntegerField('Количество')
+
+    class Meta:
+        verbose_name = 'Ингредиент списка покупок'
+        verbose_name_plural = 'Ингредиенты списка покупок'
+        constraints = (
+            models.UniqueConstraint(
+                fields=(
+                    'user',
+                    'ingredient',
+                ),
+                name='unique ingredient in shopping list',
+            ),
+        )
+
+    def __str__(self):
+        return f'{self.ingredient} ({self.amount}) в списке у {self.user}'
+
+
+class TimelineEntry(models.Model):
+    # NOTE: materialized feed of recipes from followed authors. Rows are
+    # written on recipe creation and on follow, see recipes/timeline.py.
+    # pub_date is a copy of recipe pub_date for index range reads.
+    user = models.ForeignKey(
+        User,
+        on_delete=models.CASCADE,
+        related_name='timeline',
+        verbose_name='Пользователь',
+    )
+    recipe = models.ForeignKey(
+        Recipe,
+        on_delete=models.CASCADE,
+        related_name='timeline_entries',
+        verbose_name='Рецепт',
+    )
+    author = models.ForeignKey(
+        User,
+        on_delete=models.CASCADE,
+        related_name='+',
+        verbose_name='Автор рецепта',
+    )
+    pub_date = models.DateTimeField('Дата публикации')
+
+    class Meta:
+        verbose_name = 'Запись ленты'
+        verbose_name_plural = 'Записи ленты'
+        constraints = (
+            models.UniqueConstraint(
+                fields=(
+                    'user',
+                    'recipe',
+                ),
+                name='unique recipe in timeline',
+            ),
+        )
+        indexes = (
+            models.Index(
+                fields=('user', '-pub_date'),
+                name='timeline_user_pub_date_idx',
+            ),
+            models.Index(
+                fields=('user', 'author'),
+                name='timeline_user_author_idx',
+            ),
+        )
+
+    def __str__(self):
+        return f'{self.recipe} в ленте у {self.user}'
+
+
+class RecipeSearchIndex(models.Model):
+    # NOTE: FTS5 table of SQLite search (see recipes/search.py), it is
+    # created by migration only on SQLite. Model allows to join it to
+    # recipes, so bm25 is calculated in the same query as MATCH.
+    recipe = models.OneToOneField(
+        Recipe,
+        on_delete=models.DO_NOTHING,
+        primary_key=True,
+        db_column='rowid',
+        related_name='search_index',
+    )
+
+    class Meta:
+        managed = False
+        db_table = 'recipes_recipe_fts'
@@ -0,0 +1,129 @@
+import re
+
+from django.db import connections
+from django.db.migrations.recorder import MigrationRecorder
+from django.db.models import BooleanField, FloatField, Q, Value
+from django.db.models.expressions import RawSQL
+
+from .models import Recipe, RecipeSearchIndex
+
+WORD = re.compile(r'\w+')
+TABLE = Recipe._meta.db_table
+FTS_TABLE = RecipeSearchIndex._meta.db_table
+# weights of name and text in SQLite ranking, the same as A and B weights
+# of PostgreSQL ts_rank
+NAME_WEIGHT = 10.0
+TEXT_WEIGHT = 1.0
+
+
+SEARCH_MIGRATION = ('recipes', '0009_recipe_search')
+# the same triggers as in SEARCH_MIGRATION
+SQLITE_TRIGGERS = {
+    f'{FTS_TABLE}_insert': f"""
+    CREATE TRIGGER IF NOT EXISTS {FTS_TABLE}_insert AFTER INSERT ON {TABLE}
+    BEGIN
+        INSERT INTO {FTS_TABLE}(rowid, name, text)
+        VALUES (new.id, new.name, new.text);
+    END
+    """,
+    f'{FTS_TABLE}_delete': f"""
+    CREATE TRIGGER IF NOT EXISTS {FTS_TABLE}_delete AFTER DELETE ON {TABLE}
+    BEGIN
+        INSERT INTO {FTS_TABLE}({FTS_TABLE}, rowid, name, text)
+        VALUES ('delete', old.id, old.name, old.text);
+    END
+    """,
+    f'{FTS_TABLE}_update': f"""
+    CREATE TRIGGER IF NOT EXISTS {FTS_TABLE}_update
+    AFTER UPDATE OF name, text ON {TABLE}
+    BEGIN
+        INSERT INTO {FTS_TABLE}({FTS_TABLE}, rowid, name, text)
+        VALUES ('delete', old.id, old.name, old.text);
+        INSERT INTO {FTS_TABLE}(rowid, name, text)
+        VALUES (new.id, new.name, new.text);
+    END
+    """,
+}
+
+
+def restore_sqlite_triggers(using):
+    # NOTE: SQLite drops triggers when migration rebuilds recipes table
+    # (ALTER TABLE is emulated by copy), so they are created again after
+    # migrate and index is rebuilt for rows changed without them.
+    connection = connections[using]
+    if connection.vendor != 'sqlite':
+        return
+    applied = MigrationRecorder(connection).applied_migrations()
+    if SEARCH_MIGRATION not in applied:
+        return
+    with connection.cursor() as cursor:
+        cursor.execute(
+            "SELECT name FROM sqlite_master WHERE type = 'trigger' "
+            'AND tbl_name = %s',
+            (TABLE,),
+        )
+        if set(SQLITE_TRIGGERS) <= {name for name, in cursor.fetchall()}:
+            return
+        for statement in SQLITE_TRIGGERS.values():
+            cursor.execute(statement)
+        cursor.execute(
+            f"INSERT INTO {FTS_TABLE}({FTS_TABLE}) VALUES ('rebuild')"
+        )
+
+
+def _postgresql(queryset, text):
+    query = "websearch_to_tsquery('russian', %s)"
+    return queryset.annotate(
+        search_rank=RawSQL(
+            f'ts_rank({TABLE}.search_vector, {query})',
+            (text,),
+            output_field=FloatField(),
+        )
+    ).filter(
+        id__in=RawSQL(
+            f'SELECT id FROM {TABLE} WHERE search_vector @@ {query}', (text,)
+        )
+    )
+
+
+def _sqlite(queryset, words):
+    # every word is a prefix, so "суп" finds "супы" without stemming
+    match = ' '.join(f'"{word}"*' for word in words)
+    # NOTE: FTS table is joined, bm25 is valid only in the query with MATCH
+    # and correlated subquery would search the whole index for every row
+    return queryset.filter(
+        RawSQL(f'{FTS_TABLE} MATCH %s', (match,), output_field=BooleanField()),
+        search_index__isnull=False,
+    ).annotate(
+        # bm25 is less for better matches
+        search_rank=RawSQL(
+            f'-bm25({FTS_TABLE}, {NAME_WEIGHT}, {TEXT_WEIGHT})',
+            (),
+            output_field=FloatField(),
+        )
+    )
+
+
+def _fallback(queryset, words):
+    condition = Q()
+    for word in words:
+        condition &= Q(name__icontains=word) | Q(text__icontains=word)
+    return queryset.filter(condition).annotate(
+        search_rank=Value(0.0, output_field=FloatField())
+    )
+
+
+def search_recipes(queryset, text):
+    # Recipes with all words of text in name or text. search_rank is
+    # annotated, recipes are ordered by it and then by publication date.
+    words = WORD.findall(text.lower())
+    if not words:
+        return queryset.none()
+    vendor = connections[queryset.db].vendor
+    if vendor == 'postgresql':
+        queryset = _postgresql(queryset, text)
+    elif vendor == 'sqlite':
+        queryset = _sqlite(queryset, words)
+    else:
+        queryset = _fallback(queryset, words)
+    return queryset.order_by('-search_rank', '-pub_date', '-id')
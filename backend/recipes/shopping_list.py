@@ -0,0 +1,127 @@
+from django.contrib.auth import get_user_model
+from django.db.models import Case, F, IntegerField, Sum, Value, When
+
+from ingredients.models import Ingredient
+from ingredients.units import merge_amounts
+from .models import ShoppingCart, ShoppingListItem, UsedIngredient
+
+User = get_user_model()
+
+BATCH_SIZE = 1000
+
+
+def _amounts(used_ingredients):
+    # total amount of every ingredient
+    return dict(
+        used_ingredients.order_by()
+        .values('ingredient_id')
+        .annotate(total=Sum('amount'))
+        .values_list('ingredient_id', 'total')
+    )
+
+
+def _apply(user_ids, deltas):
+    deltas = {pk: delta for pk, delta in deltas.items() if delta}
+    if not deltas:
+        return
+    # rows are created with zero amount first, so concurrent requests
+    # change the same row by F expression instead of overwriting it
+    added = [pk for pk, delta in deltas.items() if delta > 0]
+    if added:
+        ShoppingListItem.objects.bulk_create(
+            (
+                ShoppingListItem(user_id=user_id, ingredient_id=pk, amount=0)
+                for user_id in user_ids
+                for pk in added
+            ),
+            batch_size=BATCH_SIZE,
+            ignore_conflicts=True,
+        )
+    items = ShoppingListItem.objects.filter(
+        user_id__in=user_ids, ingredient_id__in=deltas
+    )
+    items.update(
+        amount=F('amount')
+        + Case(
+            *(
+                When(ingredient_id=pk, then=Value(delta))
+                for pk, delta in deltas.items()
+            ),
+            output_field=IntegerField(),
+        )
+    )
+    items.filter(amount__lte=0).delete()
+
+
+def _recipe_amounts(recipe_ids):
+    return _amounts(UsedIngredient.objects.filter(recipe_id__in=recipe_ids))
+
+
+def add_recipes(user_id, recipe_ids):
+    _apply([user_id], _recipe_amounts(recipe_ids))
+
+
+def remove_recipes(user_id, recipe_ids):
+    amounts = _recipe_amounts(recipe_ids)
+    _apply([user_id], {pk: -amount for pk, amount in amounts.items()})
+
+
+def change_recipe(recipe_id, deltas):
+    # deltas of ingredient amounts are applied to lists of all users who
+    # have the recipe in shopping cart
+    if not any(deltas.values()):
+        return
+    user_ids = ShoppingCart.objects.filter(recipe_id=recipe_id).values_list(
+        'user_id', flat=True
+    )
+    # NOTE: the same user locks as cart actions take (lock_user in
+    # api/common/batch.py), so rows are not deleted at zero amount while
+    # concurrent cart action changes them. Users are locked in order of ids
+    # to avoid deadlocks, carts are selected again after the lock.
+    list(
+        User.objects.select_for_update()
+        .filter(id__in=user_ids)
+        .order_by('id')
+        .values_list('id', flat=True)
+    )
+    _apply(list(user_ids), deltas)
+
+
+def compute(user_id):
+    # shopping list aggregated from recipes in shopping cart
+    return _amounts(
+        UsedIngredient.objects.filter(recipe__shopping_recipe__user=user_id)
+    )
+
+
+def is_consistent(user_id):
+    stored = dict(
+        ShoppingListItem.objects.filter(user_id=user_id).values_list(
+            'ingredient_id', 'amount'
+        )
+    )
+    return stored == compute(user_id)
+
+
+def rebuild(*user_ids):
+    ShoppingListItem.objects.filter(user_id__in=user_ids).delete()
+    for user_id in user_ids:
+        ShoppingListItem.objects.bulk_create(
+            (
+                ShoppingListItem(
+                    user_id=user_id, ingredient_id=pk, amount=amount
+                )
+                for pk, amount in compute(user_id).items()
+            ),
+            batch_size=BATCH_SIZE,
+        )
+
+
+def get_items(user):
+    # the same ingredient in different units (г/кг, мл/л) is one item
+    return merge_amounts(
+        Ingredient.objects.filter(shopping_list_items__user=user)
+        .annotate(amount=F('shopping_list_items__amount'))
+        .values('id', 'name', 'measurement_unit', 'amount')
+        .order_by('name')
+    )
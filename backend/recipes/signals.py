@@ -0,0 +1,67 @@
+from django.db.models.signals import (
+    post_delete,
+    post_migrate,
+    post_save,
+    pre_delete,
+)
+from django.dispatch import receiver
+
+from users.models import Follow
+from . import search, shopping_list, timeline
+from .models import Favorite, Recipe, ShoppingCart
+
+COUNTERS = {Favorite: 'favorites_count', ShoppingCart: 'in_carts_count'}
+
+
+@receiver(post_save, sender=Recipe)
+def fan_out_recipe(sender, instance, created, raw=False, **kwargs):
+    if created and not raw:
+        timeline.fan_out(instance)
+
+
+@receiver(post_save, sender=Follow)
+def backfill_timeline(sender, instance, created, raw=False, **kwargs):
+    if created and not raw:
+        timeline.backfill(instance.user_id, instance.author_id)
+
+
+@receiver(post_delete, sender=Follow)
+def drop_from_timeline(sender, instance, **kwargs):
+    timeline.drop(instance.user_id, instance.author_id)
+
+
+@receiver(post_save, sender=ShoppingCart)
+def add_to_shopping_list(sender, instance, created, raw=False, **kwargs):
+    if created and not raw:
+        shopping_list.add_recipes(instance.user_id, [instance.recipe_id])
+
+
+# NOTE: pre_delete, because on deletion of recipe its ingredients could be
+# deleted before post_delete of shopping cart rows
+@receiver(pre_delete, sender=ShoppingCart)
+def remove_from_shopping_list(sender, instance, **kwargs):
+    shopping_list.remove_recipes(instance.user_id, [instance.recipe_id])
+
+
+# NOTE: bulk_create does not send post_save, such paths recount counters
+@receiver(post_save, sender=Favorite)
+@receiver(post_save, sender=ShoppingCart)
+def increase_counter(sender, instance, created, raw=False, **kwargs):
+    if created and not raw:
+        Recipe.objects.filter(id=instance.recipe_id).change_counter(
+            COUNTERS[sender], 1
+        )
+
+
+@receiver(post_delete, sender=Favorite)
+@receiver(post_delete, sender=ShoppingCart)
+def decrease_counter(sender, instance, **kwargs):
+    Recipe.objects.filter(id=instance.recipe_id).change_counter(
+        COUNTERS[sender], -1
+    )
+
+
+@receiver(post_migrate)
+def restore_search_triggers(sender, using, **kwargs):
+    if sender.name == 'recipes':
+        search.restore_sqlite_triggers(using)
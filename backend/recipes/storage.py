@@ -0,0 +1,31 @@
+import hashlib
+import os
+
+from django.core.files.storage import FileSystemStorage
+from django.utils.deconstruct import deconstructible
+
+
+@deconstructible
+class ContentAddressedStorage(FileSystemStorage):
+    # NOTE: files are stored by sha256 of their content in sharded
+    # directories: images/ab/cd/abcd...png. The same image uploaded again
+    # is not written, existing file is reused. Files are not deleted with
+    # recipes, unused ones are removed by "cleanup_images" command.
+
+    def _save(self, name, content):
+        digest = hashlib.sha256()
+        for chunk in content.chunks():
+            digest.update(chunk)
+        digest = digest.hexdigest()
+        directory = os.path.dirname(name)
+        ext = os.path.splitext(name)[1].lower()
+        name = os.path.join(
+            directory, digest[:2], digest[2:4], digest + ext
+        ).replace('\\', '/')
+        try:
+            # reused file is touched, so "cleanup_images --min-age" does not
+            # remove it while recipe referencing it is being saved
+            os.utime(self.path(name))
+        except FileNotFoundError:
+            return super()._save(name, content)
+        return name
@@ -0,0 +1,91 @@
+from itertools import islice
+
+from django.conf import settings
+from django.db.models import F
+
+from users.models import Follow
+from .models import Recipe, TimelineEntry
+
+
+def _bulk_create(entries):
+    entries = iter(entries)
+    while True:
+        batch = list(islice(entries, settings.FEED_BATCH_SIZE))
+        if not batch:
+            return
+        TimelineEntry.objects.bulk_create(batch, ignore_conflicts=True)
+
+
+def is_pull_mode(user_id):
+    # NOTE: timelines of users who follow too many authors are not
+    # backfilled, their feed is read directly from recipes of the authors.
+    follows = Follow.objects.filter(user_id=user_id).count()
+    return follows > settings.FEED_PULL_THRESHOLD
+
+
+def fan_out(recipe):
+    followers = (
+        Follow.objects.filter(author_id=recipe.author_id)
+        .values_list('user_id', flat=True)
+        .iterator()
+    )
+    _bulk_create(
+        TimelineEntry(
+            user_id=user_id,
+            recipe_id=recipe.id,
+            author_id=recipe.author_id,
+            pub_date=recipe.pub_date,
+        )
+        for user_id in followers
+    )
+
+
+def _backfill(user_id, recipes):
+    _bulk_create(
+        TimelineEntry(
+            user_id=user_id,
+            recipe_id=recipe_id,
+            author_id=author_id,
+            pub_date=pub_date,
+        )
+        for recipe_id, author_id, pub_date in recipes.values_list(
+            'id', 'author_id', 'pub_date'
+        ).iterator()
+    )
+
+
+def backfill(user_id, *author_ids):
+    if is_pull_mode(user_id):
+        return
+    _backfill(user_id, Recipe.objects.filter(author_id__in=author_ids))
+
+
+def rebuild(user_id):
+    TimelineEntry.objects.filter(user_id=user_id).delete()
+    if is_pull_mode(user_id):
+        return
+    _backfill(
+        user_id, Recipe.objects.filter(author__following__user_id=user_id)
+    )
+
+
+def drop(user_id, *author_ids):
+    TimelineEntry.objects.filter(
+        user_id=user_id, author_id__in=author_ids
+    ).delete()
+    # user returned from pull mode, but authors followed in pull mode were
+    # not backfilled
+    follows = Follow.objects.filter(user_id=user_id).count()
+    if follows <= settings.FEED_PULL_THRESHOLD < follows + len(author_ids):
+        rebuild(user_id)
+
+
+def get_feed(user):
+    # Recipes of followed authors ordered by feed_date
+    if is_pull_mode(user.id):
+        return Recipe.objects.filter(author__following__user=user).annotate(
+            feed_date=F('pub_date')
+        )
+    return Recipe.objects.filter(timeline_entries__user=user).annotate(
+        feed_date=F('timeline_entries__pub_date')
+    )
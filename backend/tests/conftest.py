@@ -0,0 +1,95 @@
+import pytest
+from django.core.cache import cache
+from rest_framework.test import APIClient
+
+from ingredients.models import Ingredient
+from recipes.models import Favorite, Recipe, ShoppingCart, UsedIngredient
+from tags.models import Tag
+from users.models import Follow
+
+
+@pytest.fixture(autouse=True)
+def clear_cache():
+    # recipe responses and fragments are cached between requests
+    cache.clear()
+    yield
+    cache.clear()
+
+
+@pytest.fixture
+def user(django_user_model):
+    return django_user_model.objects.create_user(
+        username='user',
+        email='user@example.com',
+        password='password',
+        first_name='Иван',
+        last_name='Иванов',
+    )
+
+
+@pytest.fixture
+def author(django_user_model):
+    return django_user_model.objects.create_user(
+        username='author',
+        email='author@example.com',
+        password='password',
+        first_name='Петр',
+        last_name='Петров',
+    )
+
+
+@pytest.fixture
+def anon_client():
+    return APIClient(HTTP_HOST='testserver')
+
+
+@pytest.fixture
+def user_client(user):
+    client = APIClient(HTTP_HOST='testserver')
+    client.force_authenticate(user)
+    return client
+
+
+@pytest.fixture
+def counters():
+    # favorites_count and in_carts_count stored in database
+    def get_counters(recipe):
+        recipe.refresh_from_db()
+        return recipe.favorites_count, recipe.in_carts_count
+
+    return get_counters
+
+
+@pytest.fixture
+def recipes(author, user):
+    tags = [
+        Tag.objects.create(name=f'Тег {idx}', slug=f'tag{idx}', color='#fff')
+        for idx in range(3)
+    ]
+    ingredients = [
+        Ingredient.objects.create(
+            name=f'ингредиент {idx}', measurement_unit='г'
+        )
+        for idx in range(10)
+    ]
+    recipes = []
+    for idx in range(120):
+        recipe = Recipe.objects.create(
+            author=author,
+            name=f'Рецепт {idx}',
+            text='текст',
+            cooking_time=idx + 1,
+            image='images/test.jpg',
+        )
+        recipe.tags.set(tags[: idx % 3 + 1])
+        UsedIngredient.objects.bulk_create(
+            UsedIngredient(recipe=recipe, ingredient=ingredient, amount=idx + 1)
+            for ingredient in ingredients[: idx % 5 + 1]
+        )
+        recipes.append(recipe)
+    for recipe in recipes[::2]:
+        Favorite.objects.create(user=user, recipe=recipe)
+    for recipe in recipes[::3]:
+        ShoppingCart.objects.create(user=user, recipe=recipe)
+    Follow.objects.create(user=user, author=author)
+    return recipes
@@ -0,0 +1,77 @@
+import pytest
+
+from recipes import shopping_list
+from recipes.models import Favorite, Recipe, ShoppingCart, TimelineEntry
+
+MISSING_ID = 10**6
+
+
+def statuses(response):
+    assert response.status_code == 200
+    return [result['status'] for result in response.json()['results']]
+
+
+@pytest.mark.django_db
+@pytest.mark.parametrize('url', ('favorite', 'shopping_cart'))
+def test_add_recipes(user, user_client, recipes, url, counters):
+    ids = [recipes[0].id, recipes[1].id, MISSING_ID]
+    response = user_client.post(f'/api/recipes/{url}/', {'ids': ids})
+    assert statuses(response) == ['exists', 'added', 'not_found']
+    response = user_client.post(f'/api/recipes/{url}/', {'ids': ids})
+    assert statuses(response) == ['exists', 'exists', 'not_found']
+    assert counters(recipes[0]) == (1, 1)
+    assert counters(recipes[1]) == (
+        (1, 0) if url == 'favorite' else (0, 1)
+    )
+    assert shopping_list.is_consistent(user.id)
+
+
+@pytest.mark.django_db
+@pytest.mark.parametrize('url', ('favorite', 'shopping_cart'))
+def test_remove_recipes(user, user_client, recipes, url, counters):
+    ids = [recipes[0].id, recipes[1].id, MISSING_ID]
+    response = user_client.delete(f'/api/recipes/{url}/', {'ids': ids})
+    assert statuses(response) == ['removed', 'absent', 'not_found']
+    response = user_client.delete(f'/api/recipes/{url}/', {'ids': ids})
+    assert statuses(response) == ['absent', 'absent', 'not_found']
+    assert counters(recipes[0]) == (
+        (0, 1) if url == 'favorite' else (1, 0)
+    )
+    model = Favorite if url == 'favorite' else ShoppingCart
+    assert not model.objects.filter(user=user, recipe=recipes[0]).exists()
+    assert shopping_list.is_consistent(user.id)
+
+
+@pytest.mark.django_db
+def test_unfollow_authors_rebuilds_timeline(
+    settings, django_user_model, user, user_client
+):
+    settings.FEED_PULL_THRESHOLD = 2
+    authors = [
+        django_user_model.objects.create_user(
+            username=f'author{idx}',
+            email=f'author{idx}@example.com',
+            password='password',
+        )
+        for idx in range(4)
+    ]
+    for author in authors:
+        Recipe.objects.create(
+            author=author,
+            name='Рецепт',
+            text='текст',
+            cooking_time=1,
+            image='images/test.jpg',
+        )
+    ids = [author.id for author in authors]
+    response = user_client.post('/api/users/subscribe/', {'ids': ids})
+    assert statuses(response) == ['added'] * 4
+    # timeline is not backfilled in pull mode
+    assert not TimelineEntry.objects.filter(user=user).exists()
+    response = user_client.delete('/api/users/subscribe/', {'ids': ids[1:]})
+    assert statuses(response) == ['removed'] * 3
+    assert list(
+        TimelineEntry.objects.filter(user=user).values_list(
+            'author_id', flat=True
+        )
+    ) == [authors[0].id]
@@ -0,0 +1,21 @@
+import pytest
+
+from api.ingredients.search import IngredientIndex
+from ingredients.models import Ingredient
+
+ROWS = ((1, 'Мука'), (2, 'Мускатный орех'), (3, 'Сахар'))
+
+
+@pytest.mark.django_db
+def test_index_without_refresh_keeps_built_rows():
+    index = IngredientIndex(refresh=False)
+    index.build(ROWS)
+    assert index.search('му', 10) == [1, 2]
+
+
+@pytest.mark.django_db
+def test_index_is_refreshed_by_catalog_version():
+    index = IngredientIndex()
+    assert index.search('му', 10) == []
+    ingredient = Ingredient.objects.create(name='Мука', measurement_unit='г')
+    assert index.search('му', 10) == [ingredient.id]
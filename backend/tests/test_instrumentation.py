@@ -0,0 +1,38 @@
+import pytest
+from rest_framework.test import APIClient
+
+from api.common import instrumentation
+
+
+@pytest.fixture
+def stats(settings, monkeypatch):
+    settings.INSTRUMENTATION = True
+    stats = instrumentation.EndpointStats()
+    monkeypatch.setattr(instrumentation, 'endpoint_stats', stats)
+    return stats
+
+
+def get_size(stats, endpoint):
+    return stats.report()[endpoint]['metrics']['size']['p50']
+
+
+@pytest.mark.django_db
+def test_streaming_response_size(stats, user, recipes):
+    # new client loads middleware with changed settings
+    client = APIClient(HTTP_HOST='testserver')
+    client.force_authenticate(user)
+    response = client.get('/api/recipes/download_shopping_cart/?format=csv')
+    assert response.status_code == 200
+    assert response.streaming
+    content = b''.join(response.streaming_content)
+    assert content
+    assert get_size(stats, 'download_ingredients') == len(content)
+
+
+@pytest.mark.django_db
+def test_response_size(stats, user, recipes):
+    client = APIClient(HTTP_HOST='testserver')
+    client.force_authenticate(user)
+    response = client.get('/api/recipes/?limit=6')
+    assert response.status_code == 200
+    assert get_size(stats, 'RecipeViewSet.list') == len(response.content)
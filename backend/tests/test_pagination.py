@@ -0,0 +1,43 @@
+import pytest
+
+
+def ids(response):
+    return [recipe['id'] for recipe in response.json()['results']]
+
+
+@pytest.mark.django_db
+def test_cursor_pages_match_page_numbers(anon_client, recipes):
+    expected = ids(anon_client.get('/api/recipes/', {'limit': 50}))
+    expected += ids(anon_client.get('/api/recipes/', {'limit': 50, 'page': 2}))
+    received = []
+    url = '/api/recipes/?limit=10&cursor='
+    while url and len(received) < 100:
+        response = anon_client.get(url)
+        received += ids(response)
+        url = response.json()['next']
+    assert received == expected
+
+
+@pytest.mark.django_db
+@pytest.mark.parametrize(
+    'params', ({'ordering': 'name'}, {'search': 'рецепт'})
+)
+def test_cursor_with_other_order(anon_client, recipes, params):
+    response = anon_client.get(
+        '/api/recipes/', {'limit': 5, 'cursor': '', **params}
+    )
+    assert response.status_code == 400
+    assert 'cursor' in response.json()
+
+
+@pytest.mark.django_db
+@pytest.mark.parametrize(
+    'params', ({'tags': 'unknown'}, {'is_favorited': 1})
+)
+def test_cursor_with_empty_result(anon_client, recipes, params):
+    response = anon_client.get(
+        '/api/recipes/', {'limit': 5, 'cursor': '', **params}
+    )
+    assert response.status_code == 200
+    assert response.json()['count'] == 0
+    assert response.json()['results'] == []
@@ -0,0 +1,43 @@
+import pytest
+from django.contrib import admin
+from django.test import RequestFactory
+
+from recipes.models import Favorite, Recipe, ShoppingCart
+
+
+@pytest.mark.django_db
+def test_counters_follow_api(user_client, recipes, counters):
+    recipe = recipes[1]
+    assert counters(recipe) == (0, 0)
+    user_client.post(f'/api/recipes/{recipe.id}/favorite/')
+    user_client.post(f'/api/recipes/{recipe.id}/shopping_cart/')
+    assert counters(recipe) == (1, 1)
+    user_client.delete(f'/api/recipes/{recipe.id}/favorite/')
+    user_client.delete(f'/api/recipes/{recipe.id}/shopping_cart/')
+    assert counters(recipe) == (0, 0)
+
+
+@pytest.mark.django_db
+def test_counters_follow_user_deletion(user, recipes, counters):
+    assert counters(recipes[0]) == (1, 1)
+    user.delete()
+    assert counters(recipes[0]) == (0, 0)
+
+
+@pytest.mark.django_db
+def test_counters_follow_admin(user, author, recipes, counters):
+    recipe = recipes[1]
+    request = RequestFactory().post('/')
+    request.user = author
+    for model in (Favorite, ShoppingCart):
+        model_admin = admin.site._registry[model]
+        obj = model(user=user, recipe=recipe)
+        model_admin.save_model(request, obj, None, False)
+    assert counters(recipe) == (1, 1)
+    for model in (Favorite, ShoppingCart):
+        model_admin = admin.site._registry[model]
+        model_admin.delete_queryset(
+            request, model.objects.filter(recipe=recipe)
+        )
+    assert counters(recipe) == (0, 0)
+    assert Recipe.objects.filter(favorites_count__gt=0).count() == 60
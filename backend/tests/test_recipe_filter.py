@@ -0,0 +1,65 @@
+import pytest
+from django.contrib.auth.models import AnonymousUser
+from django.http import QueryDict
+from rest_framework.test import APIRequestFactory
+
+from api.common.filters import RecipeFilter
+from recipes.models import Recipe
+
+
+def filter_recipes(params, user):
+    request = APIRequestFactory().get('/api/recipes/')
+    request.user = user
+    return RecipeFilter(
+        QueryDict(params), queryset=Recipe.objects.all(), request=request
+    ).qs
+
+
+@pytest.mark.django_db
+@pytest.mark.parametrize(
+    'params',
+    (
+        'is_favorited=1',
+        'is_favorited=0',
+        'is_in_shopping_cart=1',
+        'tags=tag0&tags=tag1',
+        'is_favorited=1&is_in_shopping_cart=1&tags=tag2',
+    ),
+)
+def test_filters_are_exists_without_distinct(user, recipes, params):
+    sql = str(filter_recipes(params, user).query).upper()
+    assert 'EXISTS' in sql
+    assert 'DISTINCT' not in sql
+    assert 'JOIN' not in sql
+
+
+@pytest.mark.django_db
+@pytest.mark.parametrize('name', ('is_favorited', 'is_in_shopping_cart'))
+def test_user_filters_are_complementary(user, recipes, name):
+    included = set(filter_recipes(f'{name}=1', user))
+    excluded = set(filter_recipes(f'{name}=0', user))
+    assert included
+    assert not included & excluded
+    assert included | excluded == set(recipes)
+
+
+@pytest.mark.django_db
+def test_user_filters_for_anonymous(recipes):
+    assert not filter_recipes('is_favorited=1', AnonymousUser()).exists()
+    assert filter_recipes('is_favorited=0', AnonymousUser()).count() == len(
+        recipes
+    )
+
+
+@pytest.mark.django_db
+def test_tags_filter_does_not_duplicate(user, recipes):
+    found = list(filter_recipes('tags=tag0&tags=tag1&tags=tag2', user))
+    assert len(found) == len(set(found)) == len(recipes)
+
+
+@pytest.mark.django_db
+def test_tags_filter_does_not_scan_tags_table(user, recipes):
+    # EXISTS subquery is an index search on SQLite and PostgreSQL
+    plan = filter_recipes('tags=tag0', user).explain()
+    assert 'SCAN U0' not in plan
+    assert 'Seq Scan on recipes_recipe_tags' not in plan
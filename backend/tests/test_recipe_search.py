@@ -0,0 +1,54 @@
+import pytest
+from django.apps import apps
+from django.core.management.sql import emit_post_migrate_signal
+from django.db import connection
+
+from recipes.models import Recipe
+from recipes.search import SQLITE_TRIGGERS, search_recipes
+
+pytestmark = pytest.mark.skipif(
+    connection.vendor != 'sqlite', reason='SQLite FTS5 index'
+)
+
+
+def triggers():
+    with connection.cursor() as cursor:
+        cursor.execute(
+            "SELECT name FROM sqlite_master WHERE type = 'trigger'"
+        )
+        return {name for name, in cursor.fetchall()} & set(SQLITE_TRIGGERS)
+
+
+def create_recipe(author, name):
+    return Recipe.objects.create(
+        author=author,
+        name=name,
+        text='текст',
+        cooking_time=1,
+        image='images/test.jpg',
+    )
+
+
+@pytest.mark.django_db
+def test_search_ranks_name_over_text(author):
+    in_text = create_recipe(author, 'Обед')
+    in_text.text = 'суп из курицы'
+    in_text.save()
+    in_name = create_recipe(author, 'Суп куриный')
+    create_recipe(author, 'Салат')
+    found = search_recipes(Recipe.objects.all(), 'суп')
+    assert list(found) == [in_name, in_text]
+    assert found[0].search_rank > found[1].search_rank
+
+
+@pytest.mark.django_db(transaction=True)
+def test_triggers_are_restored_after_table_rebuild(author):
+    assert triggers() == set(SQLITE_TRIGGERS)
+    with connection.schema_editor() as editor:
+        # the same as migrations do for ALTER TABLE on SQLite
+        editor._remake_table(Recipe)
+    assert not triggers()
+    recipe = create_recipe(author, 'Борщ')
+    emit_post_migrate_signal(0, False, connection.alias, apps=apps)
+    assert triggers() == set(SQLITE_TRIGGERS)
+    assert list(search_recipes(Recipe.objects.all(), 'борщ')) == [recipe]
@@ -0,0 +1,87 @@
+import pytest
+from rest_framework.test import APIClient
+
+from recipes import shopping_list
+
+IMAGE = (
+    'data:image/png;base64,iVBORw0KGgoAAAANSUhEUgAAAAEAAAABAgMAAABieywaAAAACVBM'
+    'VEUAAAD///9fX1/S0ecCAAAACXBIWXMAAA7EAAAOxAGVKw4bAAAACklEQVQImWNoAAAAggCB'
+    'yxOyYQAAAABJRU5ErkJggg=='
+)
+
+
+@pytest.mark.django_db
+@pytest.mark.parametrize(
+    'ingredient',
+    (
+        {'id': 1},
+        {'id': 1, 'amount': None},
+        {'id': 1, 'amount': 'много'},
+        {'id': 'один', 'amount': 1},
+        'один',
+    ),
+)
+def test_create_recipe_with_bad_ingredient(user_client, recipes, ingredient):
+    response = user_client.post(
+        '/api/recipes/',
+        {
+            'ingredients': [ingredient],
+            'tags': [],
+            'image': IMAGE,
+            'name': 'Рецепт',
+            'text': 'текст',
+            'cooking_time': 1,
+        },
+        format='json',
+    )
+    assert response.status_code == 400
+    assert 'ingredients' in response.json()
+
+
+@pytest.mark.django_db
+def test_create_and_update_recipe_fields(
+    user_client, recipes, settings, tmp_path
+):
+    settings.MEDIA_ROOT = tmp_path
+    data = {
+        'ingredients': [{'id': 1, 'amount': 10}],
+        'tags': [1],
+        'image': IMAGE,
+        'name': 'Рецепт',
+        'text': 'текст',
+        'cooking_time': 1,
+    }
+    response = user_client.post('/api/recipes/', data, format='json')
+    assert response.status_code == 201
+    for name in ('preview', 'favorites_count', 'in_carts_count'):
+        assert name not in response.json()
+    response = user_client.patch(
+        f'/api/recipes/{response.json()["id"]}/',
+        dict(data, ingredients=[{'id': 2, 'amount': 5}]),
+        format='json',
+    )
+    assert response.status_code == 200
+    assert 'preview' not in response.json()
+    assert response.json()['ingredients'] == [{'id': 2, 'amount': 5}]
+
+
+@pytest.mark.django_db
+def test_update_recipe_changes_shopping_lists(user, author, recipes):
+    client = APIClient(HTTP_HOST='testserver')
+    client.force_authenticate(author)
+    recipe = recipes[0]
+    ingredient_id = recipe.ingredients.first().id
+    response = client.patch(
+        f'/api/recipes/{recipe.id}/',
+        {
+            'ingredients': [{'id': ingredient_id, 'amount': 100}],
+            'tags': [recipe.tags.first().id],
+            'image': IMAGE,
+            'name': recipe.name,
+            'text': recipe.text,
+            'cooking_time': recipe.cooking_time,
+        },
+        format='json',
+    )
+    assert response.status_code == 200
+    assert shopping_list.is_consistent(user.id)
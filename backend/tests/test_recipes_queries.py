@@ -0,0 +1,32 @@
+import pytest
+
+# number of queries for the recipe list does not depend on page size
+MAX_LIST_QUERIES = 8
+
+
+@pytest.mark.django_db
+@pytest.mark.parametrize('limit', (6, 100))
+@pytest.mark.parametrize('client_name', ('anon_client', 'user_client'))
+def test_recipe_list_queries(
+    request, recipes, django_assert_max_num_queries, limit, client_name
+):
+    client = request.getfixturevalue(client_name)
+    with django_assert_max_num_queries(MAX_LIST_QUERIES):
+        response = client.get('/api/recipes/', {'limit': limit})
+    assert response.status_code == 200
+    assert len(response.json()['results']) == limit
+
+
+@pytest.mark.django_db
+@pytest.mark.parametrize('limit', (6, 100))
+def test_recipe_list_user_flags(user_client, recipes, limit):
+    results = user_client.get('/api/recipes/', {'limit': limit}).json()[
+        'results'
+    ]
+    by_id = {recipe.id: index for index, recipe in enumerate(recipes)}
+    for data in results:
+        index = by_id[data['id']]
+        assert data['is_favorited'] == (index % 2 == 0)
+        assert data['is_in_shopping_cart'] == (index % 3 == 0)
+        assert data['author']['is_subscribed'] is True
+        assert len(data['ingredients']) == index % 5 + 1
@@ -0,0 +1,23 @@
+import os
+import time
+
+from django.core.files.base import ContentFile
+
+from recipes.storage import ContentAddressedStorage
+
+
+def test_same_content_is_stored_once(tmp_path):
+    storage = ContentAddressedStorage(location=tmp_path)
+    first = storage.save('images/a.png', ContentFile(b'image'))
+    second = storage.save('images/b.PNG', ContentFile(b'image'))
+    assert first == second
+    assert first.startswith('images/') and first.endswith('.png')
+
+
+def test_reused_file_is_touched(tmp_path):
+    storage = ContentAddressedStorage(location=tmp_path)
+    name = storage.save('images/a.png', ContentFile(b'image'))
+    old = time.time() - 48 * 3600
+    os.utime(storage.path(name), (old, old))
+    storage.save('images/a.png', ContentFile(b'image'))
+    assert storage.get_modified_time(name).timestamp() > old + 3600